@@ -0,0 +1,181 @@
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+# process.py sets up Django on import
+import process
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from generate_data import write_dataset
+from province_data.middleware import endpoint_metrics, reset_endpoint_metrics
+from province_data.models import City, DataofPlatforms
+from province_data.urls import urlpatterns
+
+# name: (provinces, days); every province gets all three platforms per day
+SCALES = {
+    "small": (10, 30),
+    "medium": (81, 365),
+    "large": (81, 730),
+    "district": (400, 365),
+}
+# Server-Sent Events streams never finish, so they are not timed
+STREAMS = {"stream_city_changes", "stream_national_changes"}
+# staff-only diagnostics, not part of what the frontend requests
+ADMIN_ONLY = {"get_request_metrics"}
+WINDOWED = {
+    "get_city_when_clicked",
+    "get_national_trends_data",
+    "get_regional_performances",
+    "get_national_social_comparison",
+    "get_national_bundle",
+}
+
+
+def endpoint_requests(window):
+    # (label, method, path, body) for every url name in province_data/urls.py
+    city_ids = [str(city_id) for city_id in City.objects.values_list('id', flat=True)]
+    city_id = city_ids[0]
+    city_urls = {"get_city_when_clicked", "get_city_real_time", "get_city_social_comparison"}
+    posts = {
+        "post_city_compare": {"cities": city_ids[:5]},
+        "post_filter_apply": {"hashtags": ["#orman", "#yangın", "#deprem"]},
+    }
+    requests = []
+    for pattern in urlpatterns:
+        name = pattern.name
+        if name in STREAMS or name in ADMIN_ONLY:
+            continue
+        path = reverse(name, kwargs={"city_id": city_id} if name in city_urls else None)
+        method = "post" if name in posts else "get"
+        requests.append((name, method, path, posts.get(name)))
+        if name in WINDOWED:
+            requests.append((f"{name}?window", method, f"{path}?{window}", None))
+    return requests
+
+
+def measure(client, method, path, body, repeat):
+    # Cold timings: the response cache is cleared before every request and
+    # the first request only warms the process up.
+    timings = []
+    queries = 0
+    for attempt in range(repeat + 1):
+        cache.clear()
+        reset_endpoint_metrics()
+        start = time.perf_counter()
+        response = getattr(client, method)(path, body, content_type="application/json")
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} answered {response.status_code}")
+        if attempt:
+            timings.append(elapsed * 1000)
+            queries = max([queries] + [metrics["maxQueries"] for metrics in endpoint_metrics()])
+    cache.clear()
+    tracemalloc.start()
+    getattr(client, method)(path, body, content_type="application/json")
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if len(timings) > 1:
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+        p50, p95 = percentiles[49], percentiles[94]
+    else:
+        p50 = p95 = timings[0]
+    return {
+        "p50": round(p50, 2),
+        "p95": round(p95, 2),
+        "queries": queries,
+        "peakKiB": round(peak / 1024),
+    }
+
+
+def run_scale(scale, repeat, seed):
+    provinces, days = SCALES[scale]
+    end = timezone.localdate() - timedelta(days=15)
+    call_command("flush", interactive=False, verbosity=0)
+    with tempfile.TemporaryDirectory() as out_dir:
+        province_file, data_file = write_dataset(out_dir, provinces, days, end, seed)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            process.main(province_file, data_file)
+        ingest = time.perf_counter() - start
+    window = f"from={(end - timedelta(days=89)).isoformat()}&to={end.isoformat()}&granularity=week"
+    client = Client()
+    endpoints = {}
+    for label, method, path, body in endpoint_requests(window):
+        endpoints[label] = measure(client, method, path, body, repeat)
+    return {
+        "provinces": provinces,
+        "days": days,
+        "rows": DataofPlatforms.objects.count(),
+        "ingestSeconds": round(ingest, 2),
+        "endpoints": endpoints,
+    }
+
+
+def report(scale, result, baseline=None):
+    print(f"\n{scale}: {result['provinces']} provinces x {result['days']} days, "
+          f"{result['rows']} rows, ingest {result['ingestSeconds']} s")
+    header = f"{'endpoint':<44}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'peak KiB':>10}"
+    if baseline:
+        header += f"{'p50 vs base':>13}{'queries vs base':>17}"
+    print(header)
+    for label, values in result["endpoints"].items():
+        line = f"{label:<44}{values['p50']:>10}{values['p95']:>10}{values['queries']:>9}{values['peakKiB']:>10}"
+        base = (baseline or {}).get("endpoints", {}).get(label)
+        if base:
+            ratio = values["p50"] / base["p50"] if base["p50"] else 0
+            line += f"{ratio:>12.2f}x{values['queries'] - base['queries']:>+17}"
+        print(line)
+
+
+def main(scales, repeat=10, seed=0, save=None, compare=None, test_db=True):
+    baselines = {}
+    if compare:
+        with open(compare, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+    results = {}
+    # A throwaway test database, so the configured one is never touched, in
+    # the test environment, so the client's host is allowed and DEBUG does
+    # not log every query. Under the test runner both exist already.
+    if test_db:
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        for scale in scales:
+            results[scale] = run_scale(scale, repeat, seed)
+            report(scale, results[scale], baselines.get(scale))
+    finally:
+        if test_db:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+    if save:
+        with open(save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nSaved results to {save}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every endpoint on synthetic data.")
+    parser.add_argument("--scales", default="small", help="comma separated: " + ", ".join(SCALES))
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results to this JSON file, e.g. as a baseline")
+    parser.add_argument("--compare", help="a JSON file saved with --save to compare against")
+    args = parser.parse_args()
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error("unknown scales: " + ", ".join(unknown))
+    main(scales, args.repeat, args.seed, args.save, args.compare)
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jeososyal_backend.settings')
+django.setup()
+
+from province_data.ingest import write_records
+
+BASE_DIR = Path(__file__).resolve().parent
+PLATFORM_NAMES = ["X (Twitter)", "Instagram", "NSosyal"]
+NATIONAL_HASHTAGS = [
+    "#deprem", "#yangın", "#orman", "#sel", "#kuraklık", "#iklimkrizi", "#doğa", "#türkiye",
+    "#çevre", "#hava", "#subaskını", "#heyelan", "#buzlanma", "#fırtına", "#erozyon", "#geridönüşüm",
+]
+TOPICS = [
+    "Çevre", "Afet", "İklim", "Tarım", "Su", "Enerji", "Hava Kirliliği", "Orman", "Hayvan Hakları",
+    "Atık", "Ulaşım", "Kentleşme",
+]
+
+
+def zipf_weights(size, exponent):
+    return [1 / (rank ** exponent) for rank in range(1, size + 1)]
+
+
+def load_provinces(count):
+    # The real 81 provinces first; larger scales add district-like entries
+    # in the same regions, as the planned district-level data would.
+    with open(BASE_DIR / 'data_province.json', 'r', encoding='utf-8') as f:
+        provinces = json.load(f)
+    result = provinces[:count]
+    district = 1
+    while len(result) < count:
+        for province in provinces:
+            if len(result) == count:
+                break
+            result.append({"name": f"{province['name']} İlçe {district}", "region": province["region"]})
+        district += 1
+    return result
+
+
+def zipf_counts(rng, vocabulary, weights, picks):
+    # `picks` mentions drawn from a Zipf distribution over the vocabulary.
+    counts = {}
+    for tag in rng.choices(vocabulary, weights=weights, k=picks):
+        counts[tag] = counts.get(tag, 0) + 1
+    return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+
+def generate_records(provinces, days, end=None, seed=0, exponent=1.1):
+    """
+    Yields one record per province, platform and day in the format of
+    data.json, ending `end` (15 days ago by default, where the trend window
+    ends).
+    """
+    rng = random.Random(seed)
+    if end is None:
+        end = date.today() - timedelta(days=15)
+    topic_weights = zipf_weights(len(TOPICS), exponent)
+    for province in provinces:
+        slug = province["name"].lower().replace(" ", "")
+        vocabulary = [f"#{slug}"] + NATIONAL_HASHTAGS + [f"#{slug}{i}" for i in range(1, 65)]
+        rng.shuffle(vocabulary)
+        weights = zipf_weights(len(vocabulary), exponent)
+        activity = rng.lognormvariate(3, 1)
+        for name in PLATFORM_NAMES:
+            for offset in range(days):
+                posts = max(1, int(rng.lognormvariate(0, 0.8) * activity))
+                positive = rng.randint(0, posts)
+                negative = rng.randint(0, posts - positive)
+                yield {
+                    "name": name,
+                    "posts": posts,
+                    "city": province["name"],
+                    "date": (end - timedelta(days=offset)).isoformat(),
+                    "sentiment": {"Pozitif": positive, "Nötr": posts - positive - negative, "Negatif": negative},
+                    "hashtags_list": zipf_counts(rng, vocabulary, weights, posts * 2),
+                    "topics_list": zipf_counts(rng, TOPICS, topic_weights, posts),
+                }
+
+
+def write_dataset(out_dir, provinces, days, end=None, seed=0):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    province_list = load_provinces(provinces)
+    province_file = out_dir / 'data_province.json'
+    data_file = out_dir / 'data.json'
+    with open(province_file, 'w', encoding='utf-8') as f:
+        json.dump(province_list, f, ensure_ascii=False)
+    # records are written as they are generated, never held all at once
+    write_records(data_file, generate_records(province_list, days, end, seed))
+    return province_file, data_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic data_province.json and data.json.")
+    parser.add_argument("--provinces", type=int, default=81)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="last date, YYYY-MM-DD")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default="synthetic")
+    args = parser.parse_args()
+    province_file, data_file = write_dataset(args.out_dir, args.provinces, args.days, args.end, args.seed)
+    print(f"Wrote {province_file} and {data_file}")
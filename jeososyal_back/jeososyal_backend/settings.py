@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'province_data.middleware.QueryMetricsMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -60,6 +61,10 @@ REST_FRAMEWORK = {
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'province_data.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 CORS_ORIGIN_ALLOW_ALL = True
@@ -111,6 +116,20 @@ DATABASES = {
 
 '''
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Read endpoints cache their payloads per dataset version, so entries go
+# stale only when process.py bumps the version, never by timeout alone;
+# old versions' entries are evicted once the cache reaches MAX_ENTRIES.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "jeososyal",
+        "TIMEOUT": None,
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -1,7 +1,6 @@
-import json
+import argparse
 import os
 import django
-import json
 
 # --- Django Setup Boilerplate (MUST BE AT THE TOP) ---
 print("Setting up Django environment...")
@@ -13,42 +12,29 @@ print("Django environment is ready.")
 
 
 # ✅ Now it is safe to import your Django models
-from province_data.models import City, DataofPlatforms, NationalDataLog
+from province_data.models import City
+from province_data.ingest import write_records
 
 def generate_json_file(output_filename="data_province.json"):
     """
-    Creates a sample Python dictionary, then writes it to a JSON file.
-    This function demonstrates the core logic of JSON file creation in Python.
+    Writes the cities in the database to a JSON file, the format
+    process.py reads back. A .ndjson or .jsonl file name gets one record
+    per line.
     """
     try:
-        # --- 1. Define the Data in a Python Dictionary ---
-        # In your Django application, this dictionary would be built dynamically
-        # with data you retrieve from your models.
+        # --- 1. Stream the Data from the Database ---
+        # The records come from an iterator over the City table and go
+        # straight to the file, so no list of every city is built.
         print("preparing data")
-        output_data = []
-        cities = City.objects.all()
-        for city in cities:
-            data = {
-                "name":city.name,
-                "region":city.region
-            }
-            output_data.append(data)
-        print("Data structure created.")
+        cities = City.objects.values('name', 'region').iterator()
 
         # --- 2. Write the Data to a JSON file ---
-        # The 'with open(...)' syntax ensures the file is properly closed,
-        # even if errors occur.
+        # write_records() writes one record at a time, either as the same
+        # indented, non-ASCII JSON array json.dump(indent=4) wrote or as NDJSON.
         print(f"Writing data to '{output_filename}'...")
-        with open(output_filename, 'w', encoding='utf-8') as json_file:
-            # json.dump() serializes the Python dictionary into a JSON formatted string
-            # and writes it to the file.
-            # - `output_data`: The Python object to write.
-            # - `json_file`: The file object to write to.
-            # - `indent=4`: This makes the JSON file human-readable with pretty-printing.
-            # - `ensure_ascii=False`: Allows non-ASCII characters (like accents) to be written as-is.
-            json.dump(output_data, json_file, indent=4, ensure_ascii=False)
+        count = write_records(output_filename, cities)
 
-        print(f"\nSuccessfully created '{output_filename}' with the sample data.")
+        print(f"\nSuccessfully created '{output_filename}' with {count} cities.")
 
     except IOError as e:
         print(f"Error writing to file: {e}")
@@ -59,5 +45,8 @@ def generate_json_file(output_filename="data_province.json"):
 if __name__ == "__main__":
     # This block will only run when the script is executed directly.
     # It calls the function to generate the JSON file.
-    generate_json_file()
-
+    parser = argparse.ArgumentParser(description="Write the cities in the database to a JSON file.")
+    parser.add_argument("output_filename", nargs="?", default="data_province.json",
+                        help="a .json file, or .ndjson/.jsonl for one record per line")
+    args = parser.parse_args()
+    generate_json_file(args.output_filename)
@@ -1,6 +1,6 @@
+import argparse
 import os
 import django
-import json
 
 # --- Django Setup Boilerplate (MUST BE AT THE TOP) ---
 print("Setting up Django environment...")
@@ -10,85 +10,124 @@ django.setup()
 print("Django environment is ready.")
 # --- End of Setup ---
 from django.conf import settings
+from django.db import transaction
 
 # ✅ Now it is safe to import your Django models
-from province_data.models import City, DataofPlatforms, NationalDataLog
+from province_data.ingest import (
+    add_city_totals,
+    create_cities,
+    ingest_platforms,
+    ingest_watermark,
+    latest_platform_date,
+    read_records,
+    rebuild_cities,
+)
+from province_data.utils import (
+    extend_daily_rollups,
+    update_city_snapshots,
+    rebuild_city_snapshots,
+    rebuild_platform_summaries,
+    rebuild_daily_rollups,
+    rebuild_hashtag_index,
+    rebuild_national_logs,
+    bump_dataset_version,
+    rebuild_city_tags,
+)
 
 
-def main():
+def main(province_file=None, data_file=None, incremental=False):
     """
-    Your main script logic goes here.
+    Your main script logic goes here. The input files default to the
+    data_province.json and data.json next to manage.py; either may be a
+    JSON array or NDJSON, one record per line. An incremental run
+    only loads the days after the last ingested date and adds them to the
+    aggregates, touching only the cities and dates they cover.
     """
+    watermark = ingest_watermark() if incremental else None
+    if incremental and watermark is None:
+        print("\nNo data loaded yet, running a full ingest.")
+        incremental = False
+
     # Assuming 'settings.BASE_DIR' is what you intended for the project root
     print("\nCreating Cities...")
 
-    file_path = settings.BASE_DIR / 'data_province.json'
-
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    for city in data:
-        province = City.objects.create(name=city["name"], region = city["region"])
+    file_path = province_file or settings.BASE_DIR / 'data_province.json'
+    city_ids = create_cities(read_records(file_path))
     
     print("\nCities created")
-    file_path = settings.BASE_DIR / 'data.json'
-
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    for platform in data:
-        try:
-            # Assuming platform['city'] is the name of the city
-            city = City.objects.get(name=platform['city'])
-            pltfrm = DataofPlatforms.objects.create(
-                name=platform['name'], 
-                city=city, 
-                posts=platform['posts'], 
-                hashtags_list=platform['hashtags_list'], 
-                topics_list=platform['topics_list'], 
-                date=platform['date']
-            )
-            
-            # Using .get() is safer than direct access, prevents KeyErrors
-            positive = platform.get('sentiment', {}).get('Pozitif', 0)
-            neutral = platform.get('sentiment', {}).get('Nötr', 0)
-            negative = platform.get('sentiment', {}).get('Negatif', 0)
-            
-            pltfrm.set_sentiment(positive, neutral, negative)
-            pltfrm.set_inclination()
-            pltfrm.organize_hashtags()
-            pltfrm.organize_topics()
-
-        except City.DoesNotExist:
-            print(f"WARNING: City '{platform['city']}' not found in the database. Skipping.")
-        except Exception as e:
-            print(f"An error occurred while processing platform {platform.get('name')}: {e}")
-
-    print("\nResetting and recalculating city-wide data...")
-    print(f"Processing {len(data)} platforms from JSON file...")
-    
-    for city in City.objects.all():
-        city.hashtags_list = {}
-        city.topics_list = {}
-        city.set_sentiment(0, 0, 0)
-        city.set_sentiment_with_social()
-        city.set_inclination()
-        city.set_hashtags_with_social()
-        city.set_topics_with_social()
-        city.organize_hashtags()
-        city.organize_topics()
-
-    print("\nUpdating national data logs...")
-    for platform in DataofPlatforms.objects.all():
-        try:
-            # Using get_or_create is cleaner and safer
-            log, created = NationalDataLog.objects.get_or_create(date=platform.date)
-            log.set_posts()
-        except Exception as e:
-            print(f"An error occurred while updating national log for date {platform.date}: {e}")
-            
+    file_path = data_file or settings.BASE_DIR / 'data.json'
+
+    # records are read and written batch by batch, so the data file is
+    # never held in memory as a whole
+    print(f"Processing platforms from {file_path}...")
+    written = ingest_platforms(read_records(file_path), city_ids, after=watermark)
+    print(f"{written} platform rows written")
+
+    if incremental:
+        if not written:
+            print(f"\nNothing newer than {watermark} to ingest.")
+            return
+        # These stages add to what the cities already hold, and the watermark
+        # only moves with the version bump; they commit together, so a run
+        # failing halfway leaves nothing a rerun would add twice.
+        with transaction.atomic():
+            print(f"\nAdding the days after {watermark} to city-wide data...")
+            changed = add_city_totals(watermark)
+
+            print("\nUpdating city hashtag and topic tables...")
+            rebuild_city_tags(changed)
+
+            print("\nUpdating city snapshots...")
+            update_city_snapshots(changed, watermark)
+
+            # still a full pass over the platform rows: a new day can move
+            # any platform's top region or main hashtag
+            print("\nBuilding platform summaries...")
+            rebuild_platform_summaries()
+
+            print("\nExtending daily rollups...")
+            extend_daily_rollups(watermark)
+
+            print("\nUpdating hashtag index...")
+            rebuild_hashtag_index(changed)
+
+            print("\nUpdating national data logs...")
+            rebuild_national_logs(watermark)
+
+            dataset = bump_dataset_version(latest_platform_date())
+    else:
+        print("\nRecalculating city-wide data...")
+        rebuild_cities()
+
+        print("\nBuilding city hashtag and topic tables...")
+        rebuild_city_tags()
+
+        print("\nBuilding city snapshots...")
+        rebuild_city_snapshots()
+
+        print("\nBuilding platform summaries...")
+        rebuild_platform_summaries()
+
+        print("\nBuilding daily rollups...")
+        rebuild_daily_rollups()
+
+        print("\nBuilding hashtag index...")
+        rebuild_hashtag_index()
+
+        print("\nBuilding national data logs...")
+        rebuild_national_logs()
+
+        dataset = bump_dataset_version(latest_platform_date())
+    print(f"\nDataset version is now {dataset.version}, data loaded through {dataset.ingested_through}.")
+
     print("\nScript finished successfully!")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Load data_province.json and data.json into the database.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only load the days after the last ingested date")
+    parser.add_argument("--province-file", default=None)
+    parser.add_argument("--data-file", default=None)
+    args = parser.parse_args()
+    main(args.province_file, args.data_file, args.incremental)
\ No newline at end of file
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ProvinceDataConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "province_data"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .middleware import install_query_recorder
+        connection_created.connect(install_query_recorder)
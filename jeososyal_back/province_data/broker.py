@@ -0,0 +1,42 @@
+import threading
+
+
+class LocalBroker:
+    """
+    In-process pub/sub: every message published on a channel is put on the
+    asyncio queue of each subscriber of that channel. publish() may be
+    called from any thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channel, loop, queue):
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add((loop, queue))
+
+    def unsubscribe(self, channel, loop, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, set())
+            subscribers.discard((loop, queue))
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+    def channels(self):
+        with self._lock:
+            return list(self._subscribers)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                # the subscriber's event loop is already closed
+                self.unsubscribe(channel, loop, queue)
+        return len(subscribers)
+
+
+broker = LocalBroker()
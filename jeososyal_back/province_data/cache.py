@@ -0,0 +1,104 @@
+from functools import wraps
+from urllib.parse import urlencode
+
+from datetime import datetime, time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework import status
+from rest_framework.response import Response
+
+from .utils import aget_dataset_version, get_dataset_version
+
+
+def request_dataset(request):
+    # The version row is read once per request and shared by the
+    # conditional headers and the payload cache.
+    if not hasattr(request, '_dataset'):
+        request._dataset = get_dataset_version()
+    return request._dataset
+
+
+async def arequest_dataset(request):
+    if not hasattr(request, '_dataset'):
+        request._dataset = await aget_dataset_version()
+    return request._dataset
+
+
+def dataset_etag(request, *args, **kwargs):
+    dataset = request_dataset(request)
+    return f"{dataset.version}-{timezone.localdate().isoformat()}"
+
+
+def dataset_last_modified(request, *args, **kwargs):
+    # Payloads also change when the trend window moves at midnight.
+    dataset = request_dataset(request)
+    day_start = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    if dataset.updated_at is None:
+        return day_start
+    return max(dataset.updated_at, day_start)
+
+
+conditional_response = method_decorator(
+    condition(etag_func=dataset_etag, last_modified_func=dataset_last_modified)
+)
+
+
+def async_conditional_response(view_method):
+    # condition() calls the etag and last-modified functions synchronously,
+    # so the version row is loaded through the async ORM beforehand.
+    conditional = conditional_response(view_method)
+
+    @wraps(view_method)
+    async def wrapper(self, request, *args, **kwargs):
+        await arequest_dataset(request)
+        return await conditional(self, request, *args, **kwargs)
+    return wrapper
+
+
+def response_cache_key(request):
+    # The trend windows move with the calendar day, so the day is part of
+    # the key next to the path and query string.
+    params = urlencode(sorted(request.GET.items()))
+    return f"response:{timezone.localdate().isoformat()}:{request.path}?{params}"
+
+
+def cached_response(view_method):
+    """
+    Serve a GET handler's payload from the cache until process.py bumps
+    the dataset version. Only 200 responses are stored.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        version = request_dataset(request).version
+        key = response_cache_key(request)
+        payload = cache.get(key, version=version)
+        if payload is not None:
+            return Response(payload, status=status.HTTP_200_OK)
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, version=version)
+        return response
+    return wrapper
+
+
+def async_cached_response(view_method):
+    """
+    cached_response for async handlers, which return rendered JSON
+    responses; the rendered body is what gets cached.
+    """
+    @wraps(view_method)
+    async def wrapper(self, request, *args, **kwargs):
+        version = (await arequest_dataset(request)).version
+        key = response_cache_key(request)
+        content = await cache.aget(key, version=version)
+        if content is not None:
+            return HttpResponse(content, content_type='application/json')
+        response = await view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            await cache.aset(key, response.content, version=version)
+        return response
+    return wrapper
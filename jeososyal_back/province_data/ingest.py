@@ -0,0 +1,352 @@
+import json
+import re
+import textwrap
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Max
+
+from .models import City, DataofPlatforms, sentiment_inclination
+from .utils import add_national_counts, add_platform_tags, get_dataset_version, sort_by_count
+
+# rows written per transaction
+BATCH_SIZE = 1000
+# characters read from a data file at a time
+CHUNK_SIZE = 1 << 16
+NDJSON_SUFFIXES = ('.ndjson', '.jsonl')
+JSON_SPACE = re.compile(r'[ \t\n\r]*')
+
+
+def read_json_array(f, chunk_size=CHUNK_SIZE):
+    # The elements of the JSON array in `f`, decoded one by one as the file
+    # is read, so only the unread part of the current chunk is kept.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+
+    def read_more():
+        nonlocal buffer, pos
+        chunk = f.read(chunk_size)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return bool(chunk)
+
+    def skip_space():
+        nonlocal pos
+        while True:
+            pos = JSON_SPACE.match(buffer, pos).end()
+            if pos < len(buffer) or not read_more():
+                return
+
+    skip_space()
+    if buffer[pos:pos + 1] != '[':
+        raise ValueError("The data file does not hold a JSON array.")
+    pos += 1
+    skip_space()
+    if buffer[pos:pos + 1] == ']':
+        return
+    while True:
+        while True:
+            try:
+                element, pos = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError:
+                # the element runs on in the next chunk, unless the file ended
+                if not read_more():
+                    raise
+        yield element
+        skip_space()
+        separator = buffer[pos:pos + 1]
+        pos += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(f"Expected ',' or ']' in the data file, found {separator!r}.")
+        skip_space()
+
+
+def read_records(path, chunk_size=CHUNK_SIZE):
+    """
+    Yield the records of a data file one at a time. A file starting with
+    '[' is read as a JSON array, anything else as NDJSON, one record per
+    line. Memory stays bounded by a chunk and a record, whatever the size
+    of the file.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(chunk_size).lstrip()
+        f.seek(0)
+        if head.startswith('['):
+            yield from read_json_array(f, chunk_size)
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def write_records(path, records):
+    # The other way round: .ndjson and .jsonl files get one record per
+    # line, anything else the indented array json.dump(indent=4) writes,
+    # one record at a time. Returns the number of records written.
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        ndjson = str(path).endswith(NDJSON_SUFFIXES)
+        if not ndjson:
+            f.write('[')
+        for record in records:
+            if ndjson:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            else:
+                f.write(',\n' if count else '\n')
+                f.write(textwrap.indent(json.dumps(record, ensure_ascii=False, indent=4), '    '))
+            count += 1
+        if not ndjson:
+            f.write('\n]' if count else ']')
+    return count
+
+
+def create_cities(provinces):
+    # Cities are keyed by their unique name; existing ones are left as is.
+    City.objects.bulk_create(
+        [City(name=province["name"], region=province["region"]) for province in provinces],
+        ignore_conflicts=True,
+        batch_size=BATCH_SIZE,
+    )
+    return dict(City.objects.values_list('name', 'id'))
+
+
+def organize_platform(platform):
+    # What set_inclination(), organize_hashtags() and organize_topics()
+    # leave behind, without saving.
+    platform.inclination = sentiment_inclination(platform.sentiment, platform.inclination)
+    if isinstance(platform.hashtags_list, dict):
+        platform.hashtags_list = sort_by_count(platform.hashtags_list)
+        platform.mainHashtag = next(iter(platform.hashtags_list), None)
+    if isinstance(platform.topics_list, dict):
+        platform.topics_list = sort_by_count(platform.topics_list)
+        platform.mainTopic = next(iter(platform.topics_list), None)
+
+
+def clean_field(name, value):
+    # the model field's own checks: choices, max_length and, for posts, a
+    # non-negative 64-bit value; bad values raise ValidationError here
+    # instead of failing their whole batch in the database
+    return DataofPlatforms._meta.get_field(name).clean(value, None)
+
+
+def build_platform(record, city_id):
+    # The row DataofPlatforms.objects.create() followed by set_sentiment()
+    # and organize_platform() would leave behind, built without touching
+    # the database.
+    sentiment = record.get('sentiment') or {}
+    platform = DataofPlatforms(
+        name=clean_field('name', record['name']),
+        city_id=city_id,
+        posts=clean_field('posts', record['posts']),
+        date=DataofPlatforms._meta.get_field('date').to_python(record['date']),
+        sentiment={"Pozitif":sentiment.get('Pozitif', 0), "Nötr":sentiment.get('Nötr', 0), "Negatif":sentiment.get('Negatif', 0)},
+        hashtags_list=record['hashtags_list'],
+        topics_list=record['topics_list'],
+    )
+    organize_platform(platform)
+    return platform
+
+
+def merge_counts(current, new):
+    counts = dict(current) if isinstance(current, dict) else {}
+    if isinstance(new, dict):
+        for key, val in new.items():
+            counts[key] = counts.get(key, 0) + val
+    return counts
+
+
+def add_platform_counts(platform, posts, sentiment, hashtags_list, topics_list):
+    # Another record of the same (platform, city, date) is summed into
+    # `platform`, as (name, city, date) is unique.
+    platform.posts += posts
+    platform.sentiment = merge_counts(platform.sentiment, sentiment)
+    platform.hashtags_list = merge_counts(platform.hashtags_list, hashtags_list)
+    platform.topics_list = merge_counts(platform.topics_list, topics_list)
+    organize_platform(platform)
+
+
+# what a re-delivered (platform, city, date) row overwrites
+UPSERT_FIELDS = ['posts', 'mainTopic', 'mainHashtag', 'sentiment', 'inclination', 'hashtags_list', 'topics_list', 'ingest_run']
+
+
+def loaded_platform_days(keys):
+    # {(name, city_id, date): (id, ingest_run, posts, sentiment,
+    # hashtags_list, topics_list)} of the rows already stored under `keys`
+    rows = (DataofPlatforms.objects
+            .filter(date__in={key[2] for key in keys}, city_id__in={key[1] for key in keys})
+            .values_list('name', 'city_id', 'date', 'id', 'ingest_run', 'posts', 'sentiment', 'hashtags_list', 'topics_list'))
+    return {(name, city_id, day): rest for name, city_id, day, *rest in rows if (name, city_id, day) in keys}
+
+
+def write_platforms(platforms, run):
+    # One transaction per batch: the rows, their national counters and their
+    # hashtag/topic count rows go in together. Rows already loaded under the
+    # same (platform, city, date) are overwritten in place and keep their
+    # id, so loading a file twice leaves the same data behind. Records
+    # repeating a key of the batch, or of a row tagged with `run` by an
+    # earlier batch, are summed instead; no keys are kept between batches.
+    # Returns how many keys the run wrote for the first time and how many
+    # rows of earlier runs were overwritten.
+    merged = {}
+    for platform in platforms:
+        key = (platform.name, platform.city_id, platform.date)
+        if key in merged:
+            add_platform_counts(merged[key], platform.posts, platform.sentiment,
+                                platform.hashtags_list, platform.topics_list)
+        else:
+            merged[key] = platform
+    with transaction.atomic():
+        loaded = loaded_platform_days(merged.keys())
+        replaced = []
+        repeated = 0
+        for key, platform in merged.items():
+            platform.ingest_run = run
+            row = loaded.get(key)
+            if row is None:
+                continue
+            platform.id = row[0]
+            if row[1] == run:
+                add_platform_counts(platform, *row[2:])
+                repeated += 1
+            replaced.append(row)
+        platforms = list(merged.values())
+        DataofPlatforms.objects.bulk_create(
+            platforms,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['name', 'city', 'date'],
+            update_fields=UPSERT_FIELDS,
+        )
+        add_national_counts(platforms, [(hashtags_list, topics_list) for *_, hashtags_list, topics_list in replaced])
+        add_platform_tags(platforms, [row[0] for row in replaced])
+    return len(merged) - repeated, len(loaded) - repeated
+
+
+def latest_platform_date():
+    return DataofPlatforms.objects.aggregate(latest=Max('date'))['latest']
+
+
+def ingest_watermark():
+    # The latest platform date loaded. Databases ingested before the
+    # watermark was stored fall back to the rows themselves.
+    dataset = get_dataset_version()
+    if dataset.ingested_through is None:
+        return latest_platform_date()
+    return dataset.ingested_through
+
+
+def ingest_platforms(records, city_ids, batch_size=BATCH_SIZE, after=None):
+    """
+    Upsert data file records in batches of `batch_size` rows, keyed on
+    (platform, city, date); records repeating a key are summed. `records`
+    may be any iterable, such as read_records(), and is consumed as the
+    batches are written. Records of unknown cities, without a date or with
+    bad values are reported and skipped. With `after`, only records dated
+    later than it are written. Returns the number of rows written.
+    """
+    # rows are tagged with the run, so memory holds one batch whatever the
+    # size of the input
+    run = uuid.uuid4()
+    written = 0
+    replaced = 0
+    earlier = 0
+    batch = []
+    for record in records:
+        if not isinstance(record, dict):
+            print(f"WARNING: {record!r} is not a record. Skipping.")
+            continue
+        city_id = city_ids.get(record.get('city'))
+        if city_id is None:
+            print(f"WARNING: City '{record.get('city')}' not found in the database. Skipping.")
+            continue
+        try:
+            platform = build_platform(record, city_id)
+        except (KeyError, TypeError, ValidationError) as e:
+            print(f"An error occurred while processing platform {record.get('name')}: {e}")
+            continue
+        if platform.date is None:
+            print(f"WARNING: {platform.name} data of {record.get('city')} has no date. Skipping.")
+            continue
+        if after is not None and platform.date <= after:
+            earlier += 1
+            continue
+        batch.append(platform)
+        if len(batch) >= batch_size:
+            new, overwritten = write_platforms(batch, run)
+            written += new
+            replaced += overwritten
+            batch = []
+    if batch:
+        new, overwritten = write_platforms(batch, run)
+        written += new
+        replaced += overwritten
+    if earlier:
+        print(f"Skipped {earlier} records dated {after} or earlier.")
+    if replaced:
+        print(f"{replaced} of the rows were already loaded and have been updated.")
+    return written
+
+
+def city_totals(platforms):
+    # {city_id: (sentiment, hashtags, topics)} summed over the platform
+    # rows in (city, date) order, like city.platforms.all() read them, so
+    # equal counts keep ranking the same way.
+    totals = {}
+    rows = platforms.order_by('city_id', 'date').values_list('city_id', 'sentiment', 'hashtags_list', 'topics_list')
+    for city_id, sentiment, hashtags, topics in rows.iterator(chunk_size=BATCH_SIZE):
+        city = totals.setdefault(city_id, ({"Pozitif":0, "Nötr":0, "Negatif":0}, {}, {}))
+        for key in city[0]:
+            city[0][key] += sentiment[key]
+        for counts, platform_counts in ((city[1], hashtags), (city[2], topics)):
+            if isinstance(platform_counts, dict):
+                for key, val in platform_counts.items():
+                    counts[key] = counts.get(key, 0) + val
+    return totals
+
+
+def set_city_totals(city, sentiment, hashtags, topics):
+    city.sentiment = sentiment
+    city.inclination = sentiment_inclination(sentiment, city.inclination)
+    city.hashtags_list = sort_by_count(hashtags)
+    city.topics_list = sort_by_count(topics)
+    city.mainHashtag = next(iter(city.hashtags_list), city.mainHashtag)
+
+
+def save_city_totals(cities):
+    with transaction.atomic():
+        City.objects.bulk_update(cities, ['sentiment', 'inclination', 'hashtags_list', 'topics_list', 'mainHashtag'],
+                                 batch_size=BATCH_SIZE)
+
+
+def rebuild_cities():
+    # The totals City.set_sentiment_with_social(), set_hashtags_with_social()
+    # and set_topics_with_social() add up, for every city in one pass over
+    # the platform rows, then organized and written with bulk_update.
+    totals = city_totals(DataofPlatforms.objects.all())
+    cities = list(City.objects.all())
+    for city in cities:
+        set_city_totals(city, *totals.get(city.id, ({"Pozitif":0, "Nötr":0, "Negatif":0}, {}, {})))
+    save_city_totals(cities)
+    return len(cities)
+
+
+def add_city_totals(since):
+    # rebuild_cities() for the rows dated after `since`: their totals are
+    # added to what their cities already hold. Returns the ids of the
+    # cities that changed; no other city is read.
+    totals = city_totals(DataofPlatforms.objects.filter(date__gt=since))
+    cities = list(City.objects.filter(id__in=totals))
+    for city in cities:
+        sentiment, hashtags, topics = totals[city.id]
+        current = city.sentiment if isinstance(city.sentiment, dict) else {}
+        sentiment = {key: current.get(key, 0) + val for key, val in sentiment.items()}
+        set_city_totals(city, sentiment, merge_counts(city.hashtags_list, hashtags),
+                        merge_counts(city.topics_list, topics))
+    save_city_totals(cities)
+    return [city.id for city in cities]
@@ -0,0 +1,130 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+# the metrics of the request being served; sync_to_async and async_to_sync
+# carry it into worker threads, so their queries are counted as well
+_request_metrics = ContextVar("request_metrics", default=None)
+
+_endpoint_lock = threading.Lock()
+_endpoint_totals = {}
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+
+    def add_query(self, duration):
+        with self.lock:
+            self.queries += 1
+            self.db_time += duration
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _request_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(time.perf_counter() - start)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # connection_created fires on every (re)connect of the same wrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_endpoint(endpoint, queries, db_time, python_time, size):
+    with _endpoint_lock:
+        totals = _endpoint_totals.setdefault(endpoint, {
+            "requests": 0, "queries": 0, "maxQueries": 0,
+            "dbTime": 0.0, "pythonTime": 0.0, "bytes": 0,
+        })
+        totals["requests"] += 1
+        totals["queries"] += queries
+        totals["maxQueries"] = max(totals["maxQueries"], queries)
+        totals["dbTime"] += db_time
+        totals["pythonTime"] += python_time
+        totals["bytes"] += size
+
+
+def endpoint_metrics():
+    # Per endpoint averages since the process started, times in ms.
+    with _endpoint_lock:
+        totals = {endpoint: dict(values) for endpoint, values in _endpoint_totals.items()}
+    metrics = []
+    for endpoint, values in sorted(totals.items()):
+        requests = values["requests"]
+        metrics.append({
+            "endpoint": endpoint,
+            "requests": requests,
+            "avgQueries": round(values["queries"] / requests, 2),
+            "maxQueries": values["maxQueries"],
+            "avgDbTime": round(values["dbTime"] * 1000 / requests, 2),
+            "avgPythonTime": round(values["pythonTime"] * 1000 / requests, 2),
+            "avgBytes": round(values["bytes"] / requests),
+        })
+    return metrics
+
+
+def reset_endpoint_metrics():
+    with _endpoint_lock:
+        _endpoint_totals.clear()
+
+
+class QueryMetricsMiddleware:
+    """
+    Count the queries, DB time, Python time and payload size of every
+    request. The numbers go out in a Server-Timing header and are summed
+    per url name for the metrics endpoint.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _request_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _request_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        python_time = max(total - metrics.db_time, 0)
+        # streamed bodies are still being produced, so their size is unknown
+        size = 0 if response.streaming else len(response.content)
+        response.headers["Server-Timing"] = (
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries", '
+            f"app;dur={python_time * 1000:.1f}, total;dur={total * 1000:.1f}"
+        )
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.url_name:
+            record_endpoint(match.url_name, metrics.queries, metrics.db_time, python_time, size)
+        return response
@@ -0,0 +1,122 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def build_snapshots(apps, schema_editor):
+    City = apps.get_model("province_data", "City")
+    CitySnapshot = apps.get_model("province_data", "CitySnapshot")
+    DataofPlatforms = apps.get_model("province_data", "DataofPlatforms")
+
+    def by_count(counts):
+        if not isinstance(counts, dict):
+            return {}
+        return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+    daily_posts = {}
+    rows = DataofPlatforms.objects.values("city_id", "date").annotate(
+        total_posts=Sum("posts")
+    )
+    for row in rows:
+        if row["date"] is not None:
+            daily_posts.setdefault(row["city_id"], {})[row["date"].isoformat()] = row[
+                "total_posts"
+            ]
+    snapshots = []
+    for city in City.objects.all():
+        sentiment = city.sentiment
+        share = None
+        if sentiment and isinstance(sentiment, dict):
+            total = sum(sentiment.values())
+            share = {"positive": 0, "neutral": 0, "negative": 0}
+            if total != 0:
+                for key, label in (
+                    ("positive", "Pozitif"),
+                    ("neutral", "Nötr"),
+                    ("negative", "Negatif"),
+                ):
+                    share[key] = (float(int((sentiment[label] / total) * 10000))) / 100
+        topics = [
+            {"text": key, "value": val}
+            for key, val in by_count(city.topics_list).items()
+        ]
+        snapshots.append(
+            CitySnapshot(
+                city=city,
+                name=city.name,
+                region=city.region,
+                mainHashtag=city.mainHashtag,
+                inclination=city.inclination,
+                sentiment=sentiment,
+                sentiment_share=share,
+                hashtags=list(by_count(city.hashtags_list).keys()),
+                topics=topics[0:10],
+                daily_posts=daily_posts.get(city.id, {}),
+            )
+        )
+    CitySnapshot.objects.bulk_create(snapshots)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0002_alter_city_name_alter_dataofplatforms_name"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CitySnapshot",
+            fields=[
+                (
+                    "city",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="snapshot",
+                        serialize=False,
+                        to="province_data.city",
+                    ),
+                ),
+                ("name", models.CharField(max_length=40)),
+                (
+                    "region",
+                    models.CharField(
+                        choices=[
+                            ("İç Anadolu Bölgesi", "İç Anadolu Bölgesi"),
+                            ("Doğu Anadolu Bölgesi", "Doğu Anadolu Bölgesi"),
+                            ("Güneydoğu Anadolu Bölgesi", "Güneydoğu Anadolu Bölgesi"),
+                            ("Ege Bölgesi", "Ege Bölgesi"),
+                            ("Marmara Bölgesi", "Marmara Bölgesi"),
+                            ("Akdeniz Bölgesi", "Akdeniz Bölgesi"),
+                            ("Karadeniz Bölgesi", "Karadeniz Bölgesi"),
+                        ]
+                    ),
+                ),
+                ("mainHashtag", models.CharField(blank=True, null=True)),
+                (
+                    "inclination",
+                    models.CharField(
+                        choices=[
+                            ("Çok Olumlu", "Çok Olumlu"),
+                            ("Olumlu", "Olumlu"),
+                            ("Nötr", "Nötr"),
+                            ("Olumsuz", "Olumsuz"),
+                            ("Çok Olumsuz", "Çok Olumsuz"),
+                        ],
+                        default="",
+                    ),
+                ),
+                ("sentiment", models.JSONField(blank=True, default=dict, null=True)),
+                (
+                    "sentiment_share",
+                    models.JSONField(blank=True, default=dict, null=True),
+                ),
+                ("hashtags", models.JSONField(blank=True, default=list)),
+                ("topics", models.JSONField(blank=True, default=list)),
+                ("daily_posts", models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+        migrations.RunPython(build_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:39
+
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Sum
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+
+
+def build_summaries(apps, schema_editor):
+    DataofPlatforms = apps.get_model("province_data", "DataofPlatforms")
+    PlatformSummary = apps.get_model("province_data", "PlatformSummary")
+
+    labels = ("Pozitif", "Nötr", "Negatif")
+    totals = DataofPlatforms.objects.values("name").annotate(
+        total_posts=Sum("posts"),
+        **{
+            label: Sum(Cast(KT(f"sentiment__{label}"), BigIntegerField()))
+            for label in labels
+        },
+    )
+    top_regions = {}
+    for row in (
+        DataofPlatforms.objects.values("name", "city__name")
+        .annotate(total_posts=Sum("posts"))
+        .order_by("name", "-total_posts")
+    ):
+        top_regions.setdefault(row["name"], row["city__name"])
+    hashtags = {}
+    for name, hashtags_list in DataofPlatforms.objects.values_list(
+        "name", "hashtags_list"
+    ):
+        if isinstance(hashtags_list, dict):
+            counts = hashtags.setdefault(name, {})
+            for key, val in hashtags_list.items():
+                counts[key] = counts.get(key, 0) + val
+    PlatformSummary.objects.bulk_create(
+        [
+            PlatformSummary(
+                name=row["name"],
+                posts=row["total_posts"] or 0,
+                sentiment={label: row[label] or 0 for label in labels},
+                topRegion=top_regions.get(row["name"]),
+                mainHashtag=max(
+                    hashtags.get(row["name"], {}).items(),
+                    key=lambda item: item[1],
+                    default=(None, 0),
+                )[0],
+            )
+            for row in totals
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0003_city_snapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlatformSummary",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        choices=[
+                            ("X (Twitter)", "X (Twitter)"),
+                            ("NSosyal", "NSosyal"),
+                            ("Instagram", "Instagram"),
+                        ],
+                        max_length=40,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("posts", models.PositiveBigIntegerField(default=0)),
+                ("sentiment", models.JSONField(blank=True, default=dict, null=True)),
+                ("topRegion", models.CharField(blank=True, null=True)),
+                ("mainHashtag", models.CharField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:42
+
+import uuid
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Sum
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+
+
+def build_rollups(apps, schema_editor):
+    DataofPlatforms = apps.get_model("province_data", "DataofPlatforms")
+    DailyRollup = apps.get_model("province_data", "DailyRollup")
+
+    sums = {
+        field: Sum(Cast(KT(f"sentiment__{key}"), BigIntegerField()))
+        for field, key in (
+            ("positive", "Pozitif"),
+            ("neutral", "Nötr"),
+            ("negative", "Negatif"),
+        )
+    }
+    rollups = []
+    for scope, group_by in (
+        ("national", None),
+        ("platform", "name"),
+        ("region", "city__region"),
+    ):
+        fields = ["date"] if group_by is None else ["date", group_by]
+        rows = (
+            DataofPlatforms.objects.filter(date__isnull=False)
+            .values(*fields)
+            .annotate(total_posts=Sum("posts"), **sums)
+        )
+        for row in rows:
+            rollups.append(
+                DailyRollup(
+                    date=row["date"],
+                    scope=scope,
+                    key="" if group_by is None else row[group_by],
+                    posts=row["total_posts"] or 0,
+                    positive=row["positive"] or 0,
+                    neutral=row["neutral"] or 0,
+                    negative=row["negative"] or 0,
+                )
+            )
+    DailyRollup.objects.bulk_create(rollups)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0004_platform_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[
+                            ("national", "national"),
+                            ("platform", "platform"),
+                            ("region", "region"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("key", models.CharField(blank=True, default="", max_length=40)),
+                ("posts", models.PositiveBigIntegerField(default=0)),
+                ("positive", models.PositiveBigIntegerField(default=0)),
+                ("neutral", models.PositiveBigIntegerField(default=0)),
+                ("negative", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("scope", "key", "date"), name="unique_daily_rollup"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:43
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+def build_index(apps, schema_editor):
+    City = apps.get_model("province_data", "City")
+    HashtagRank = apps.get_model("province_data", "HashtagRank")
+
+    ranks = []
+    for city_id, hashtags_list in City.objects.values_list("id", "hashtags_list"):
+        if not isinstance(hashtags_list, dict):
+            continue
+        hashtags = sorted(hashtags_list.items(), key=lambda item: item[1], reverse=True)
+        for rank, (hashtag, _) in enumerate(hashtags[0:20]):
+            ranks.append(HashtagRank(hashtag=hashtag, city_id=city_id, rank=rank))
+    HashtagRank.objects.bulk_create(ranks)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0005_daily_rollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HashtagRank",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("hashtag", models.CharField(db_index=True)),
+                ("rank", models.PositiveSmallIntegerField()),
+                (
+                    "city",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hashtag_ranks",
+                        to="province_data.city",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:46
+
+import uuid
+from django.db import migrations, models
+
+
+def build_counters(apps, schema_editor):
+    DataofPlatforms = apps.get_model("province_data", "DataofPlatforms")
+    NationalCounter = apps.get_model("province_data", "NationalCounter")
+
+    counts = {"hashtag": {}, "topic": {}}
+    for hashtags_list, topics_list in DataofPlatforms.objects.values_list(
+        "hashtags_list", "topics_list"
+    ):
+        for kind, counts_list in (("hashtag", hashtags_list), ("topic", topics_list)):
+            if isinstance(counts_list, dict):
+                for key, val in counts_list.items():
+                    counts[kind][key] = counts[kind].get(key, 0) + val
+    NationalCounter.objects.bulk_create(
+        [
+            NationalCounter(kind=kind, name=key, count=val)
+            for kind, kind_counts in counts.items()
+            for key, val in kind_counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0007_dataset_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NationalCounter",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("hashtag", "hashtag"), ("topic", "topic")],
+                        max_length=10,
+                    ),
+                ),
+                ("name", models.CharField()),
+                ("count", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["kind", "-count"], name="national_counter_top")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "name"), name="unique_national_counter"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_counters, migrations.RunPython.noop),
+    ]
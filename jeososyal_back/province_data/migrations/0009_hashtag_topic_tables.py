@@ -0,0 +1,252 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_tag_tables(apps, schema_editor):
+    City = apps.get_model("province_data", "City")
+    DataofPlatforms = apps.get_model("province_data", "DataofPlatforms")
+
+    for kind, field in (("hashtag", "hashtags_list"), ("topic", "topics_list")):
+        tag_model = apps.get_model("province_data", kind.capitalize())
+        for owner_model, count_model, owner in (
+            (DataofPlatforms, f"Platform{kind.capitalize()}", "platform_id"),
+            (City, f"City{kind.capitalize()}", "city_id"),
+        ):
+            count_model = apps.get_model("province_data", count_model)
+            lists = [
+                (owner_id, counts)
+                for owner_id, counts in owner_model.objects.values_list("id", field)
+                if isinstance(counts, dict)
+            ]
+            names = {key for _, counts in lists for key in counts}
+            tag_model.objects.bulk_create(
+                [tag_model(name=name) for name in names],
+                ignore_conflicts=True,
+                batch_size=500,
+            )
+            ids = dict(tag_model.objects.values_list("name", "id"))
+            count_model.objects.bulk_create(
+                [
+                    count_model(**{owner: owner_id, f"{kind}_id": ids[key]}, count=val)
+                    for owner_id, counts in lists
+                    for key, val in counts.items()
+                ],
+                batch_size=1000,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0008_national_counter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Hashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Topic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="CityHashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.PositiveBigIntegerField(default=0)),
+                (
+                    "city",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hashtag_counts",
+                        to="province_data.city",
+                    ),
+                ),
+                (
+                    "hashtag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="city_counts",
+                        to="province_data.hashtag",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["city", "-count"], name="city_hashtag_top")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("city", "hashtag"), name="unique_city_hashtag"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="PlatformHashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.PositiveBigIntegerField(default=0)),
+                (
+                    "hashtag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="platform_counts",
+                        to="province_data.hashtag",
+                    ),
+                ),
+                (
+                    "platform",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hashtag_counts",
+                        to="province_data.dataofplatforms",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["platform", "-count"], name="platform_hashtag_top"
+                    ),
+                    models.Index(
+                        fields=["hashtag", "platform"], name="platform_hashtag_lookup"
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("platform", "hashtag"), name="unique_platform_hashtag"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="PlatformTopic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.PositiveBigIntegerField(default=0)),
+                (
+                    "platform",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="topic_counts",
+                        to="province_data.dataofplatforms",
+                    ),
+                ),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="platform_counts",
+                        to="province_data.topic",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["platform", "-count"], name="platform_topic_top"
+                    ),
+                    models.Index(
+                        fields=["topic", "platform"], name="platform_topic_lookup"
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("platform", "topic"), name="unique_platform_topic"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="CityTopic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.PositiveBigIntegerField(default=0)),
+                (
+                    "city",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="topic_counts",
+                        to="province_data.city",
+                    ),
+                ),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="city_counts",
+                        to="province_data.topic",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["city", "-count"], name="city_topic_top")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("city", "topic"), name="unique_city_topic"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_tag_tables, migrations.RunPython.noop),
+    ]
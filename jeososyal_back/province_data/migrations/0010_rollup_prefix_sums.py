@@ -0,0 +1,115 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:50
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Sum
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+
+
+def build_prefix_sums(apps, schema_editor):
+    DataofPlatforms = apps.get_model("province_data", "DataofPlatforms")
+    DailyRollup = apps.get_model("province_data", "DailyRollup")
+
+    sums = {
+        field: Sum(Cast(KT(f"sentiment__{key}"), BigIntegerField()))
+        for field, key in (
+            ("positive", "Pozitif"),
+            ("neutral", "Nötr"),
+            ("negative", "Negatif"),
+        )
+    }
+    series = {}
+    for scope, group_by in (
+        ("national", None),
+        ("platform", "name"),
+        ("region", "city__region"),
+        ("city", "city_id"),
+    ):
+        fields = ["date"] if group_by is None else ["date", group_by]
+        rows = (
+            DataofPlatforms.objects.filter(date__isnull=False)
+            .values(*fields)
+            .annotate(total_posts=Sum("posts"), **sums)
+        )
+        for row in rows:
+            key = "" if group_by is None else str(row[group_by])
+            series.setdefault((scope, key), {})[row["date"]] = (
+                row["total_posts"] or 0,
+                row["positive"] or 0,
+                row["neutral"] or 0,
+                row["negative"] or 0,
+            )
+    if not series:
+        return
+    last_date = max(max(days) for days in series.values())
+    rollups = []
+    for (scope, key), days in series.items():
+        day = min(days)
+        cum = (0, 0, 0, 0)
+        while day <= last_date:
+            values = days.get(day, (0, 0, 0, 0))
+            cum = tuple(total + value for total, value in zip(cum, values))
+            rollups.append(
+                DailyRollup(
+                    date=day,
+                    scope=scope,
+                    key=key,
+                    posts=values[0],
+                    positive=values[1],
+                    neutral=values[2],
+                    negative=values[3],
+                    cum_posts=cum[0],
+                    cum_positive=cum[1],
+                    cum_neutral=cum[2],
+                    cum_negative=cum[3],
+                )
+            )
+            day += timedelta(days=1)
+    DailyRollup.objects.all().delete()
+    DailyRollup.objects.bulk_create(rollups, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0009_hashtag_topic_tables"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dailyrollup",
+            name="cum_negative",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="dailyrollup",
+            name="cum_neutral",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="dailyrollup",
+            name="cum_positive",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="dailyrollup",
+            name="cum_posts",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="dailyrollup",
+            name="scope",
+            field=models.CharField(
+                choices=[
+                    ("national", "national"),
+                    ("platform", "platform"),
+                    ("region", "region"),
+                    ("city", "city"),
+                ],
+                max_length=10,
+            ),
+        ),
+        migrations.RunPython(build_prefix_sums, migrations.RunPython.noop),
+    ]
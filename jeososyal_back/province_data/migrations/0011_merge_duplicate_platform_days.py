@@ -0,0 +1,126 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:53
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def merge_counts(kept, row, fields):
+    for field in fields:
+        counts = getattr(kept, field) or {}
+        for key, val in (getattr(row, field) or {}).items():
+            counts[key] = counts.get(key, 0) + val
+        setattr(kept, field, counts)
+
+
+def merge_duplicate_cities(apps, schema_editor):
+    # Each run of the old process.py created every city again. The copies of
+    # a name are folded into the one holding the most platform rows: their
+    # rows are repointed to it (days repeated that way are merged below) and
+    # their totals summed into it. Snapshots, ranks and rollups are read
+    # models that the next process.py run rebuilds.
+    City = apps.get_model("province_data", "City")
+    DataofPlatforms = apps.get_model("province_data", "DataofPlatforms")
+    DailyRollup = apps.get_model("province_data", "DailyRollup")
+
+    duplicates = City.objects.values("name").annotate(rows=Count("id")).filter(rows__gt=1)
+    for duplicate in duplicates:
+        cities = sorted(
+            City.objects.filter(name=duplicate["name"]).annotate(rows=Count("platforms")),
+            key=lambda city: (-city.rows, str(city.id)),
+        )
+        kept, others = cities[0], cities[1:]
+        for city in others:
+            merge_counts(kept, city, ("sentiment", "hashtags_list", "topics_list"))
+        kept.hashtags_list = dict(
+            sorted(kept.hashtags_list.items(), key=lambda item: item[1], reverse=True)
+        )
+        kept.topics_list = dict(
+            sorted(kept.topics_list.items(), key=lambda item: item[1], reverse=True)
+        )
+        kept.mainHashtag = next(iter(kept.hashtags_list), None)
+        kept.save()
+        other_ids = [city.id for city in others]
+        DataofPlatforms.objects.filter(city_id__in=other_ids).update(city_id=kept.id)
+        DailyRollup.objects.filter(scope="city", key__in=[str(city_id) for city_id in other_ids]).delete()
+        City.objects.filter(id__in=other_ids).delete()
+        for kind, field in (("hashtag", "hashtags_list"), ("topic", "topics_list")):
+            tag_model = apps.get_model("province_data", kind.capitalize())
+            count_model = apps.get_model("province_data", f"City{kind.capitalize()}")
+            count_model.objects.filter(city_id=kept.id).delete()
+            tag_model.objects.bulk_create(
+                [tag_model(name=key) for key in getattr(kept, field)], ignore_conflicts=True
+            )
+            ids = dict(
+                tag_model.objects.filter(
+                    name__in=list(getattr(kept, field))
+                ).values_list("name", "id")
+            )
+            count_model.objects.bulk_create(
+                [
+                    count_model(city_id=kept.id, count=val, **{f"{kind}_id": ids[key]})
+                    for key, val in getattr(kept, field).items()
+                ]
+            )
+
+
+def merge_duplicate_days(apps, schema_editor):
+    DataofPlatforms = apps.get_model("province_data", "DataofPlatforms")
+
+    duplicates = (
+        DataofPlatforms.objects.values("name", "city_id", "date")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        rows = list(
+            DataofPlatforms.objects.filter(
+                name=duplicate["name"],
+                city_id=duplicate["city_id"],
+                date=duplicate["date"],
+            ).order_by("id")
+        )
+        kept = rows[0]
+        for row in rows[1:]:
+            kept.posts += row.posts
+            merge_counts(kept, row, ("sentiment", "hashtags_list", "topics_list"))
+        kept.hashtags_list = dict(
+            sorted(kept.hashtags_list.items(), key=lambda item: item[1], reverse=True)
+        )
+        kept.topics_list = dict(
+            sorted(kept.topics_list.items(), key=lambda item: item[1], reverse=True)
+        )
+        kept.mainHashtag = next(iter(kept.hashtags_list), None)
+        kept.mainTopic = next(iter(kept.topics_list), None)
+        kept.save()
+        DataofPlatforms.objects.filter(id__in=[row.id for row in rows[1:]]).delete()
+        for kind, field in (("hashtag", "hashtags_list"), ("topic", "topics_list")):
+            tag_model = apps.get_model("province_data", kind.capitalize())
+            count_model = apps.get_model(
+                "province_data", f"Platform{kind.capitalize()}"
+            )
+            count_model.objects.filter(platform_id=kept.id).delete()
+            ids = dict(
+                tag_model.objects.filter(
+                    name__in=list(getattr(kept, field))
+                ).values_list("name", "id")
+            )
+            count_model.objects.bulk_create(
+                [
+                    count_model(
+                        platform_id=kept.id, count=val, **{f"{kind}_id": ids[key]}
+                    )
+                    for key, val in getattr(kept, field).items()
+                ]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0010_rollup_prefix_sums"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cities, migrations.RunPython.noop),
+        migrations.RunPython(merge_duplicate_days, migrations.RunPython.noop),
+    ]
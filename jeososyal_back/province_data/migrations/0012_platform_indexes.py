@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0011_merge_duplicate_platform_days"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="city",
+            name="name",
+            field=models.CharField(max_length=40, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name="dataofplatforms",
+            index=models.Index(fields=["city", "date"], name="platform_city_date"),
+        ),
+        migrations.AddIndex(
+            model_name="dataofplatforms",
+            index=models.Index(fields=["name", "date"], name="platform_name_date"),
+        ),
+        migrations.AddIndex(
+            model_name="dataofplatforms",
+            index=models.Index(fields=["date"], name="platform_date"),
+        ),
+        migrations.AddConstraint(
+            model_name="dataofplatforms",
+            constraint=models.UniqueConstraint(
+                fields=("name", "city", "date"), name="unique_platform_day"
+            ),
+        ),
+    ]
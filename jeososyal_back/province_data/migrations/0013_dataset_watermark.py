@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0012_platform_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="datasetversion",
+            name="ingested_through",
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
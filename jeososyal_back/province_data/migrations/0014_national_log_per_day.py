@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def drop_duplicate_days(apps, schema_editor):
+    # The logs are derived from the platform rows and rebuilt by every
+    # ingest, so extra rows of a day are dropped rather than merged.
+    NationalDataLog = apps.get_model("province_data", "NationalDataLog")
+
+    duplicates = (
+        NationalDataLog.objects.filter(date__isnull=False)
+        .values("date")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        ids = list(
+            NationalDataLog.objects.filter(date=duplicate["date"])
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        NationalDataLog.objects.filter(id__in=ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0013_dataset_watermark"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_days, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="nationaldatalog",
+            name="mainTopic",
+            field=models.CharField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="nationaldatalog",
+            name="date",
+            field=models.DateField(blank=True, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:38
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def add_platform_city_rollups(apps, schema_editor):
+    # The new scope's series for data ingested before it existed, dense up
+    # to the latest rolled up date like every other series.
+    DailyRollup = apps.get_model("province_data", "DailyRollup")
+    DataofPlatforms = apps.get_model("province_data", "DataofPlatforms")
+
+    last_date = DailyRollup.objects.aggregate(last=Max("date"))["last"]
+    if last_date is None:
+        return
+    series = {}
+    rows = DataofPlatforms.objects.filter(date__isnull=False, date__lte=last_date).values_list(
+        "name", "city_id", "date", "posts", "sentiment"
+    )
+    for name, city_id, day, posts, sentiment in rows.iterator():
+        sentiment = sentiment or {}
+        days = series.setdefault(f"{name}|{city_id}", {})
+        values = days.get(day, (0, 0, 0, 0))
+        days[day] = (
+            values[0] + posts,
+            values[1] + sentiment.get("Pozitif", 0),
+            values[2] + sentiment.get("Nötr", 0),
+            values[3] + sentiment.get("Negatif", 0),
+        )
+    rollups = []
+    for key, days in series.items():
+        day = min(days)
+        cum = (0, 0, 0, 0)
+        while day <= last_date:
+            values = days.get(day, (0, 0, 0, 0))
+            cum = tuple(total + value for total, value in zip(cum, values))
+            rollups.append(
+                DailyRollup(
+                    date=day,
+                    scope="platform_city",
+                    key=key,
+                    posts=values[0],
+                    positive=values[1],
+                    neutral=values[2],
+                    negative=values[3],
+                    cum_posts=cum[0],
+                    cum_positive=cum[1],
+                    cum_neutral=cum[2],
+                    cum_negative=cum[3],
+                )
+            )
+            day += timedelta(days=1)
+    DailyRollup.objects.bulk_create(rollups, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0014_national_log_per_day"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="dailyrollup",
+            name="key",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AlterField(
+            model_name="dailyrollup",
+            name="scope",
+            field=models.CharField(
+                choices=[
+                    ("national", "national"),
+                    ("platform", "platform"),
+                    ("region", "region"),
+                    ("city", "city"),
+                    ("platform_city", "platform_city"),
+                ],
+                max_length=16,
+            ),
+        ),
+        migrations.RunPython(add_platform_city_rollups, migrations.RunPython.noop),
+    ]
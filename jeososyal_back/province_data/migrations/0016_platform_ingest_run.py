@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("province_data", "0015_platform_city_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dataofplatforms",
+            name="ingest_run",
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
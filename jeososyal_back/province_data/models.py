@@ -3,6 +3,29 @@ import uuid
 from django.db.models import JSONField
 from django.db.models import Sum
 
+def sentiment_inclination(sentiment, current=''):
+    total = 0
+    for val in sentiment.values():
+        total += val
+    if total != 0:
+        pozitif = (float(int((sentiment["Pozitif"]/total)*10000)))/100
+        notr = (float(int((sentiment["Nötr"]/total)*10000)))/100
+    else:
+        pozitif = 0
+        notr = 0
+    point = pozitif + notr/2
+    if (point <= 100 and point >=80):
+        return 'Çok Olumlu'
+    elif (point < 80 and point >= 60):
+        return 'Olumlu'
+    elif (point < 60 and point >= 40):
+        return 'Nötr'
+    elif (point < 40 and point >= 20):
+        return 'Olumsuz'
+    elif (point <20 and point >= 0):
+        return 'Çok Olumsuz'
+    return current
+
 class City(models.Model):
     SENTIMENT_OPTIONS = [
         ('Çok Olumlu', 'Çok Olumlu'),
@@ -24,7 +47,7 @@ class City(models.Model):
     
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    name = models.CharField(max_length=40, null=False)
+    name = models.CharField(max_length=40, null=False, unique=True)
     mainHashtag = models.CharField(null=True, blank=True)
     sentiment = models.JSONField(default=dict, null=True, blank=True)
     inclination = models.CharField(default='', choices=SENTIMENT_OPTIONS)
@@ -48,26 +71,7 @@ class City(models.Model):
         self.save()
 
     def set_inclination(self):
-        total = 0
-        for val in self.sentiment.values():
-            total += val
-        if total != 0:
-            pozitif = (float(int((self.sentiment["Pozitif"]/total)*10000)))/100
-            notr = (float(int((self.sentiment["Nötr"]/total)*10000)))/100
-        else:
-            pozitif = 0
-            notr = 0
-        point = pozitif + notr/2
-        if (point <= 100 and point >=80):
-            self.inclination = 'Çok Olumlu'
-        elif (point < 80 and point >= 60):
-            self.inclination = 'Olumlu'
-        elif (point < 60 and point >= 40):
-            self.inclination = 'Nötr'
-        elif (point < 40 and point >= 20):
-            self.inclination = 'Olumsuz'
-        elif (point <20 and point >= 0):
-            self.inclination = 'Çok Olumsuz'
+        self.inclination = sentiment_inclination(self.sentiment, self.inclination)
         self.save()
 
     def organize_hashtags(self):
@@ -137,32 +141,26 @@ class DataofPlatforms(models.Model):
     hashtags_list = models.JSONField(default=dict, null=True, blank=True)
     topics_list = models.JSONField(default=dict, null=True, blank=True)
     date = models.DateField(null=True, blank=True)
+    # the ingest run that last wrote the row; records of the same run
+    # repeating its (name, city, date) are summed into it
+    ingest_run = models.UUIDField(null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'city', 'date'], name='unique_platform_day')
+        ]
+        indexes = [
+            models.Index(fields=['city', 'date'], name='platform_city_date'),
+            models.Index(fields=['name', 'date'], name='platform_name_date'),
+            models.Index(fields=['date'], name='platform_date')
+        ]
 
     def set_sentiment(self, positive, neutral, negative):
         self.sentiment = {"Pozitif":positive, "Nötr":neutral, "Negatif":negative}
         self.save()
 
     def set_inclination(self):
-        total = 0
-        for val in self.sentiment.values():
-            total += val
-        if total != 0:
-            pozitif = (float(int((self.sentiment["Pozitif"]/total)*10000)))/100
-            notr = (float(int((self.sentiment["Nötr"]/total)*10000)))/100
-        else:
-            pozitif = 0
-            notr = 0
-        point = pozitif + notr/2
-        if (point <= 100 and point >=80):
-            self.inclination = 'Çok Olumlu'
-        elif (point < 80 and point >= 60):
-            self.inclination = 'Olumlu'
-        elif (point < 60 and point >= 40):
-            self.inclination = 'Nötr'
-        elif (point < 40 and point >= 20):
-            self.inclination = 'Olumsuz'
-        elif (point <20 and point >= 0):
-            self.inclination = 'Çok Olumsuz'
+        self.inclination = sentiment_inclination(self.sentiment, self.inclination)
         self.save()
 
     def organize_hashtags(self):
@@ -187,8 +185,9 @@ class DataofPlatforms(models.Model):
 class NationalDataLog(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    date = models.DateField(null=True, blank=True)
+    date = models.DateField(null=True, blank=True, unique=True)
     topics_list = models.JSONField(default=dict, null=True, blank=True)
+    mainTopic = models.CharField(null=True, blank=True)
     posts = models.PositiveBigIntegerField(default=0)
 
 
@@ -204,8 +203,8 @@ class NationalDataLog(models.Model):
 
 
     def organize_topics(self):
-        tops = {k: v for k, v in sorted(self.topics.items(), key=lambda item: item[1], reverse=True)}
-        self.hashtags = tops
+        tops = {k: v for k, v in sorted(self.topics_list.items(), key=lambda item: item[1], reverse=True)}
+        self.topics_list = tops
         for key in tops.keys():
             self.mainTopic = key
             break
@@ -215,6 +214,177 @@ class NationalDataLog(models.Model):
         return f"{self.date} dated national data"
 
 
+class CitySnapshot(models.Model):
+
+    city = models.OneToOneField(City, primary_key=True, on_delete=models.CASCADE, related_name='snapshot')
+    name = models.CharField(max_length=40, null=False)
+    region = models.CharField(null=False, choices=City.REGIONS)
+    mainHashtag = models.CharField(null=True, blank=True)
+    inclination = models.CharField(default='', choices=City.SENTIMENT_OPTIONS)
+    sentiment = models.JSONField(default=dict, null=True, blank=True)
+    sentiment_share = models.JSONField(default=dict, null=True, blank=True)
+    hashtags = models.JSONField(default=list, blank=True)
+    topics = models.JSONField(default=list, blank=True)
+    daily_posts = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.name} snapshot"
+
+class PlatformSummary(models.Model):
+
+    name = models.CharField(max_length=40, primary_key=True, choices=DataofPlatforms.NAMES)
+    posts = models.PositiveBigIntegerField(default=0)
+    sentiment = models.JSONField(default=dict, null=True, blank=True)
+    topRegion = models.CharField(null=True, blank=True)
+    mainHashtag = models.CharField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} summary"
+
+class DailyRollup(models.Model):
+    SCOPES = [
+        ('national', 'national'),
+        ('platform', 'platform'),
+        ('region', 'region'),
+        ('city', 'city'),
+        ('platform_city', 'platform_city')
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    date = models.DateField()
+    scope = models.CharField(max_length=16, choices=SCOPES)
+    # '' for national, the platform name, region, city id, or
+    # "<platform name>|<city id>" for platform_city
+    key = models.CharField(max_length=64, blank=True, default='')
+    posts = models.PositiveBigIntegerField(default=0)
+    positive = models.PositiveBigIntegerField(default=0)
+    neutral = models.PositiveBigIntegerField(default=0)
+    negative = models.PositiveBigIntegerField(default=0)
+    # running totals from the first day of the series up to this date;
+    # every series has a row for each day up to the latest ingested date
+    cum_posts = models.PositiveBigIntegerField(default=0)
+    cum_positive = models.PositiveBigIntegerField(default=0)
+    cum_neutral = models.PositiveBigIntegerField(default=0)
+    cum_negative = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key', 'date'], name='unique_daily_rollup')
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.scope} {self.key} rollup"
+
+class HashtagRank(models.Model):
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    hashtag = models.CharField(db_index=True)
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='hashtag_ranks')
+    rank = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        return f"{self.hashtag} #{self.rank} in {self.city}"
+
+class DatasetVersion(models.Model):
+
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(null=True, blank=True)
+    # latest platform date loaded; incremental ingest only loads later days
+    ingested_through = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"dataset version {self.version}"
+
+class NationalCounter(models.Model):
+    KINDS = [
+        ('hashtag', 'hashtag'),
+        ('topic', 'topic')
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=10, choices=KINDS)
+    name = models.CharField()
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'name'], name='unique_national_counter')
+        ]
+        indexes = [
+            models.Index(fields=['kind', '-count'], name='national_counter_top')
+        ]
+
+    def __str__(self):
+        return f"{self.name}: {self.count}"
+
+class Hashtag(models.Model):
+
+    name = models.CharField(unique=True)
 
+    def __str__(self):
+        return self.name
+
+class Topic(models.Model):
 
+    name = models.CharField(unique=True)
+
+    def __str__(self):
+        return self.name
 
+class PlatformHashtag(models.Model):
+
+    platform = models.ForeignKey(DataofPlatforms, on_delete=models.CASCADE, related_name='hashtag_counts')
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='platform_counts')
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['platform', 'hashtag'], name='unique_platform_hashtag')
+        ]
+        indexes = [
+            models.Index(fields=['platform', '-count'], name='platform_hashtag_top'),
+            models.Index(fields=['hashtag', 'platform'], name='platform_hashtag_lookup')
+        ]
+
+class PlatformTopic(models.Model):
+
+    platform = models.ForeignKey(DataofPlatforms, on_delete=models.CASCADE, related_name='topic_counts')
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='platform_counts')
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['platform', 'topic'], name='unique_platform_topic')
+        ]
+        indexes = [
+            models.Index(fields=['platform', '-count'], name='platform_topic_top'),
+            models.Index(fields=['topic', 'platform'], name='platform_topic_lookup')
+        ]
+
+class CityHashtag(models.Model):
+
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='hashtag_counts')
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='city_counts')
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'hashtag'], name='unique_city_hashtag')
+        ]
+        indexes = [
+            models.Index(fields=['city', '-count'], name='city_hashtag_top')
+        ]
+
+class CityTopic(models.Model):
+
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='topic_counts')
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='city_counts')
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'topic'], name='unique_city_topic')
+        ]
+        indexes = [
+            models.Index(fields=['city', '-count'], name='city_topic_top')
+        ]
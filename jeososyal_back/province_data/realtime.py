@@ -0,0 +1,117 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+
+from .broker import broker
+from .models import City, CitySnapshot
+from .renderers import FastJSONRenderer
+from .serializers import snapshot_rows
+from .utils import aget_dataset_version, create_global_hashtags, create_global_topics, generate_global_sentiment
+
+# seconds between two reads of the dataset version by a process' watcher
+POLL_INTERVAL = 2
+# seconds of silence after which a stream sends a keep-alive comment
+KEEPALIVE_INTERVAL = 15
+NATIONAL_CHANNEL = "national"
+
+
+def city_channel(city_id):
+    return f"city:{city_id}"
+
+
+def channel_payload(channel):
+    # The payload a channel's clients see: the city snapshot as served by
+    # /provinces/<uuid>/data/, or the /national-agenda/ panels.
+    if channel == NATIONAL_CHANNEL:
+        return {
+            "sentiment": generate_global_sentiment(City.objects.all()),
+            "topTopics": create_global_topics(10),
+            "nationalHashtags": create_global_hashtags(10),
+        }
+    cities = snapshot_rows(CitySnapshot.objects.filter(city_id=channel.split(":", 1)[1]))
+    return cities[0] if cities else {}
+
+
+def payload_delta(old, new):
+    # Top-level fields whose value changed; removed fields are sent as null.
+    delta = {key: val for key, val in new.items() if old.get(key) != val}
+    delta.update({key: None for key in old if key not in new})
+    return delta
+
+
+def sse_event(event, data, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + FastJSONRenderer().render(data).decode())
+    return "\n".join(lines) + "\n\n"
+
+
+class DatasetWatcher:
+    """
+    One per process: polls the dataset version and, when ingest bumps it,
+    publishes the delta of every subscribed channel's payload to the
+    broker. Payloads are rebuilt once per change, not once per client.
+    """
+
+    def __init__(self):
+        self.payloads = {}
+        self.version = None
+        self.task = None
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self.run())
+
+    async def run(self):
+        while broker.channels():
+            dataset = await aget_dataset_version()
+            if self.version is None:
+                self.version = dataset.version
+            elif dataset.version != self.version:
+                self.version = dataset.version
+                await sync_to_async(self.publish_changes)(dataset.version)
+            await asyncio.sleep(POLL_INTERVAL)
+        self.payloads.clear()
+        self.version = None
+
+    def baseline(self, channel):
+        # Current payload of a channel, kept as the base of its next delta.
+        payload = channel_payload(channel)
+        self.payloads.setdefault(channel, payload)
+        return payload
+
+    def publish_changes(self, version):
+        for channel in broker.channels():
+            payload = channel_payload(channel)
+            delta = payload_delta(self.payloads.get(channel, {}), payload)
+            self.payloads[channel] = payload
+            if delta:
+                broker.publish(channel, sse_event("delta", delta, version))
+        for channel in list(self.payloads):
+            if channel not in broker.channels():
+                del self.payloads[channel]
+
+
+watcher = DatasetWatcher()
+
+
+async def event_stream(channel):
+    # A "snapshot" event with the full payload, then a "delta" event each
+    # time ingest changes it, with keep-alive comments in between.
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    broker.subscribe(channel, loop, queue)
+    try:
+        watcher.start()
+        dataset = await aget_dataset_version()
+        payload = await sync_to_async(watcher.baseline)(channel)
+        yield sse_event("snapshot", payload, dataset.version)
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    finally:
+        broker.unsubscribe(channel, loop, queue)
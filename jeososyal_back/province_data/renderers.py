@@ -0,0 +1,56 @@
+import math
+import re
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson and json.dumps agree on every float except those below 1e-4 or
+# from 1e16 up, which orjson writes as 1e-7 / 0.00001 / 1e16 where the json
+# module writes 1e-07 / 1e-05 / 1e+16
+FLOAT_MISMATCH = re.compile(rb'(?:^|[:,\[])-?(?:0\.0000|\d+(?:\.\d+)?e)')
+
+
+def has_non_finite(data):
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        return any(has_non_finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(has_non_finite(value) for value in data)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    DRF's JSONRenderer output, encoded with orjson when it is installed.
+    Types orjson does not know go through DRF's encoder. Indented, ASCII
+    or non-compact output falls back to the stock renderer, and so does
+    anything orjson would write differently or not at all: floats in
+    exponent form, NaN and infinities (which orjson writes as null and DRF
+    rejects) and integers wider than 64 bits.
+    """
+    encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # dates and dataclasses are left to DRF's encoder, which formats
+        # datetimes its own way
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        try:
+            ret = orjson.dumps(data, default=self.encoder.default, option=option)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if FLOAT_MISMATCH.search(ret) or (b'null' in ret and has_non_finite(data)):
+            return super().render(data, accepted_media_type, renderer_context)
+        # like DRF, escape the separators JavaScript does not allow in strings
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
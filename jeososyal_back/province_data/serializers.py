@@ -1,8 +1,6 @@
 from .models import *
 from rest_framework import serializers
-from django.utils import timezone
-from datetime import timedelta
-from .utils import generate_city_weekly_trends
+from .utils import generate_city_weekly_trends, sort_by_count, city_sentiment_share, generate_trend_from_posts, generate_window_trends
 
 class CityPreSerializer(serializers.ModelSerializer):
     sentiment = serializers.JSONField
@@ -15,7 +13,7 @@ class CityPreSerializer(serializers.ModelSerializer):
 
     def get_hashtags(self, obj):
         if obj.hashtags_list and isinstance(obj.hashtags_list, dict):
-            return list (obj.hashtags_list.keys())
+            return list (sort_by_count(obj.hashtags_list).keys())
         return []
     
 class CitySerializer(serializers.ModelSerializer):
@@ -31,37 +29,65 @@ class CitySerializer(serializers.ModelSerializer):
 
     def get_hashtags(self, obj):
         if obj.hashtags_list and isinstance(obj.hashtags_list, dict):
-            return (list (obj.hashtags_list.keys()))[0:10]
+            return (list (sort_by_count(obj.hashtags_list).keys()))[0:10]
         return []
     def get_topics(self, obj):
         topics = []
         if obj.topics_list and isinstance(obj.topics_list, dict):
-            topic = obj.topics_list
+            topic = sort_by_count(obj.topics_list)
             for key,val in topic.items():
                 topics.append({"text":key,"value":val})
             return topics[0:10]
         return []
     def get_sentiment(self, obj):
-        if obj.sentiment and isinstance(obj.sentiment, dict):
-            total = 0
-            for val in obj.sentiment.values():
-                total += val
-            if total != 0:
-                pozitif = (float(int((obj.sentiment["Pozitif"]/total)*10000)))/100
-                notr = (float(int((obj.sentiment["Nötr"]/total)*10000)))/100
-                negatif = (float(int((obj.sentiment["Negatif"]/total)*10000)))/100
-                sentiment = {"positive":pozitif,"neutral":notr,"negative":negatif}
-            else:sentiment = {"positive":0,"neutral":0,"negative":0}
-            return sentiment
+        return city_sentiment_share(obj.sentiment)
     def get_weeklyTrend(self, obj):
-        today = timezone.localdate()
-        yesterday = today - timedelta(days=1)
-        try:
-            platforms = DataofPlatforms.objects.filter(city = obj, date=today)
-        except not platforms.exists():
-            try:
-                platforms = DataofPlatforms.objects.filter(city = obj, date=yesterday)
-            except not platforms.exists():
-                return []
-        weeklyTrend = generate_city_weekly_trends(obj.id)
-        return weeklyTrend
\ No newline at end of file
+        weekly_trends = self.context.get('weekly_trends')
+        if weekly_trends is not None and obj.id in weekly_trends:
+            return weekly_trends[obj.id]
+        return generate_city_weekly_trends(obj.id)
+
+class CitySnapshotPreSerializer(serializers.ModelSerializer):
+    id = serializers.UUIDField(source='city_id', read_only=True)
+
+    class Meta:
+        fields = ('id', 'name', 'mainHashtag', 'sentiment', 'inclination', 'hashtags', 'region')
+        read_only_fields = fields
+        model = CitySnapshot
+
+class CitySnapshotSerializer(serializers.ModelSerializer):
+    id = serializers.UUIDField(source='city_id', read_only=True)
+    sentiment = serializers.JSONField(source='sentiment_share', read_only=True)
+    hashtags = serializers.SerializerMethodField()
+    weeklyTrend = serializers.SerializerMethodField()
+
+    class Meta:
+        fields = ('id', 'name', 'sentiment', 'hashtags', 'topics', 'weeklyTrend')
+        read_only_fields = fields
+        model = CitySnapshot
+
+    def get_hashtags(self, obj):
+        return obj.hashtags[0:10]
+    def get_weeklyTrend(self, obj):
+        window = self.context.get('window')
+        if window:
+            return generate_window_trends('city', str(obj.city_id), window)
+        return generate_trend_from_posts(obj.daily_posts)
+
+# Plain-dict builds of the two snapshot serializers' output, straight from
+# .values() rows; tests keep their rendered JSON identical.
+def snapshot_pre_rows(snapshots):
+    rows = snapshots.values('city_id', 'name', 'mainHashtag', 'sentiment', 'inclination', 'hashtags', 'region')
+    return [{"id":row['city_id'], "name":row['name'], "mainHashtag":row['mainHashtag'], "sentiment":row['sentiment'],
+             "inclination":row['inclination'], "hashtags":row['hashtags'], "region":row['region']} for row in rows]
+
+def snapshot_rows(snapshots, window=None):
+    cities = []
+    for row in snapshots.values('city_id', 'name', 'sentiment_share', 'hashtags', 'topics', 'daily_posts'):
+        if window:
+            weeklyTrend = generate_window_trends('city', str(row['city_id']), window)
+        else:
+            weeklyTrend = generate_trend_from_posts(row['daily_posts'])
+        cities.append({"id":row['city_id'], "name":row['name'], "sentiment":row['sentiment_share'],
+                       "hashtags":row['hashtags'][0:10], "topics":row['topics'], "weeklyTrend":weeklyTrend})
+    return cities
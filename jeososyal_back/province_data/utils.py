@@ -1,28 +1,47 @@
 from .models import *
+import asyncio
+import uuid
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, transaction
+from django.db.models import BigIntegerField, F, Max, Q, Sum, Window
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, RowNumber
 from django.utils import timezone
-from datetime import timedelta
-
-def prepare_city(city_id):
-    this_city = City.objects.get(id= city_id)
-    this_city.set_inclination()
-    this_city.organize_hashtags()
-    if this_city.topics_list:
-        this_city.organize_topics()
-    this_city.save()
-    return this_city
-
-def create_global_hashtags(cities):
-    hashtags_list = {}
-    for city in cities:
-        for key, val in city.hashtags_list.items():
-            if key in hashtags_list.keys():
-                itemval = hashtags_list[key]
-                hashtags_list.update({key:itemval + val})
-            else: 
-                hashtags_list.update({key:val})
-    hashtags_list = {k: v for k, v in sorted(hashtags_list.items(), key=lambda item: item[1], reverse=True)}
-    hashtags_list = list (hashtags_list.keys())
-    return hashtags_list
+from datetime import date, timedelta
+
+DAY_NAMES = ["Paz", "Pzt", "Sal", "Çar", "Per", "Cum", "Cmt"]
+PLATFORMS = {"X (Twitter)":"twitter", "Instagram":"instagram", "NSosyal":"next"}
+GRANULARITIES = ("day", "week", "month")
+# longest window the date-range parameters accept, about ten years
+MAX_WINDOW_DAYS = 3660
+SENTIMENT_KEYS = {"positive": "Pozitif", "neutral": "Nötr", "negative": "Negatif"}
+TAG_TABLES = {
+    'hashtag': (Hashtag, PlatformHashtag, CityHashtag, 'hashtags_list'),
+    'topic': (Topic, PlatformTopic, CityTopic, 'topics_list'),
+}
+# only the top 20 hashtags of a city earn filter points
+HASHTAG_INDEX_DEPTH = 20
+# most cities one compare request may ask for
+MAX_COMPARE_CITIES = 10
+# DailyRollup scopes and the fields whose values, joined by '|', key a series
+ROLLUP_GROUPS = {
+    'national': (),
+    'platform': ('name',),
+    'region': ('city__region',),
+    'city': ('city_id',),
+    'platform_city': ('name', 'city_id'),
+}
+
+def sort_by_count(counts):
+    # JSONField order is not kept by every backend (jsonb sorts its keys),
+    # so readers sort in memory instead of re-saving the city.
+    if not counts or not isinstance(counts, dict):
+        return {}
+    return {k: v for k, v in sorted(counts.items(), key=lambda item: item[1], reverse=True)}
+
+def create_global_hashtags(limit=None):
+    counters = NationalCounter.objects.filter(kind='hashtag').order_by('-count', 'name')
+    return list(counters.values_list('name', flat=True)[0:limit])
 
 def generate_global_sentiment(cities):
     sentiment={"positive":0 , "neutral":0 , "negative":0}
@@ -43,112 +62,302 @@ def generate_global_sentiment(cities):
     sentiment.update({"negative": (float(int((e/c)*100000)))/1000})
     return sentiment
 
-def create_global_topics(cities):
-    topics_list = {}
-    for city in cities:
-        for key, val in city.topics_list.items():
-            if key in topics_list.keys():
-                itemval = topics_list[key]
-                topics_list.update({key:itemval + val})
-            else: 
-                topics_list.update({key:val})
-    topics_list = {k: v for k, v in sorted(topics_list.items(), key=lambda item: item[1], reverse=True)}
+def create_global_topics(limit=None):
+    counters = NationalCounter.objects.filter(kind='topic').order_by('-count', 'name')
     topics = []
-    for key, val in topics_list.items():
-        topics.append({"name":key, "mentions":val, "trend":0})
+    for name, count in counters.values_list('name', 'count')[0:limit]:
+        topics.append({"name":name, "mentions":count, "trend":0})
     return topics
 
-def generate_city_weekly_trends(city_id):
-    trend = []
-    city = City.objects.get(id = city_id)
+def add_national_counts(platforms, replaced=()):
+    # Adds the hashtag and topic counts of newly ingested platform rows to
+    # the national counters, touching only the names those rows mention.
+    # `replaced` holds the (hashtags_list, topics_list) of rows the new ones
+    # overwrote; their counts are taken back.
+    counts = {'hashtag': {}, 'topic': {}}
+    lists = [(1, platform.hashtags_list, platform.topics_list) for platform in platforms]
+    lists += [(-1, hashtags_list, topics_list) for hashtags_list, topics_list in replaced]
+    for sign, hashtags_list, topics_list in lists:
+        for kind, counts_list in (('hashtag', hashtags_list), ('topic', topics_list)):
+            if not isinstance(counts_list, dict):
+                continue
+            for key, val in counts_list.items():
+                counts[kind][key] = counts[kind].get(key, 0) + sign * val
+    with transaction.atomic():
+        for kind, kind_counts in counts.items():
+            if not kind_counts:
+                continue
+            existing = NationalCounter.objects.select_for_update().filter(kind=kind, name__in=list(kind_counts))
+            changed = []
+            emptied = []
+            for counter in existing:
+                counter.count += kind_counts.pop(counter.name)
+                if counter.count > 0:
+                    changed.append(counter)
+                else:
+                    emptied.append(counter.id)
+            NationalCounter.objects.bulk_update(changed, ['count'], batch_size=1000)
+            NationalCounter.objects.filter(id__in=emptied).delete()
+            NationalCounter.objects.bulk_create(
+                [NationalCounter(kind=kind, name=key, count=val) for key, val in kind_counts.items() if val > 0],
+                batch_size=1000,
+            )
+
+def trend_window():
     today = timezone.localdate()
     today = today - timedelta(days=15)
-    for i in range(0,6):
-        day = today - timedelta(days=i)
-        platforms = DataofPlatforms.objects.filter(city = city, date=day)
-        posts = 0
-        for platform in platforms:
-            posts += platform.posts
-        day_num = day.strftime('%w')
-        day_name = ""
-        match int(day_num):
-            case 0:
-                day_name = "Paz"
-            case 1:
-                day_name = "Pzt"
-            case 2:
-                day_name = "Sal"
-            case 3:
-                day_name = "Çar"
-            case 4:
-                day_name = "Per"
-            case 5:
-                day_name = "Cum"
-            case 6:
-                day_name = "Cmt"
-        trend.insert(0,{"day":day_name, "sayı":posts})
+    return [today - timedelta(days=i) for i in range(5, -1, -1)]
+
+def generate_trend_from_posts(daily_posts):
+    trend = []
+    for day in trend_window():
+        day_name = DAY_NAMES[int(day.strftime('%w'))]
+        trend.append({"day":day_name, "sayı":daily_posts.get(day.isoformat(), 0)})
     return trend
 
-def generate_national_weekly_trends():
+def window_posts(group_by=None, **filters):
+    # One range query for the whole trend window, grouped by day (and
+    # optionally by city or platform), as {group: {iso date: posts}}.
+    days = trend_window()
+    fields = ['date'] if group_by is None else ['date', group_by]
+    rows = (DataofPlatforms.objects
+            .filter(date__range=(days[0], days[-1]), **filters)
+            .values(*fields)
+            .annotate(total_posts=Sum('posts')))
+    posts = {}
+    for row in rows:
+        group = None if group_by is None else row[group_by]
+        posts.setdefault(group, {})[row['date'].isoformat()] = row['total_posts']
+    return posts
+
+def generate_city_weekly_trends(city_id):
+    daily_posts = window_posts(city_id=city_id).get(None, {})
+    return generate_trend_from_posts(daily_posts)
+
+def generate_cities_weekly_trends(city_ids):
+    posts = window_posts('city_id', city_id__in=city_ids)
+    trends = {}
+    for city_id in city_ids:
+        trends[city_id] = generate_trend_from_posts(posts.get(city_id, {}))
+    return trends
+
+def rollup_posts(scope, days):
+    return rollup_posts_by_scope([scope], days).get(scope, {})
+
+def rollup_posts_by_scope(scopes, days):
+    # {scope: {key: {iso date: posts}}} for several scopes in one query.
+    rows = (DailyRollup.objects
+            .filter(scope__in=scopes, date__in=days)
+            .values_list('scope', 'key', 'date', 'posts'))
+    posts = {}
+    for scope, key, day, total_posts in rows:
+        posts.setdefault(scope, {}).setdefault(key, {})[day.isoformat()] = total_posts
+    return posts
+
+def parse_window(params):
+    # `from`/`to`/`granularity` query parameters; None when none is given,
+    # so callers keep their fixed 6-day window.
+    if not any(name in params for name in ("from", "to", "granularity")):
+        return None
+    try:
+        date_to = date.fromisoformat(params["to"]) if "to" in params else trend_window()[-1]
+        date_from = date.fromisoformat(params["from"]) if "from" in params else date_to - timedelta(days=5)
+    except ValueError:
+        raise ValueError("from and to must be dates formatted as YYYY-MM-DD")
+    granularity = params.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        raise ValueError("granularity must be one of: " + ", ".join(GRANULARITIES))
+    if date_from > date_to:
+        raise ValueError("from must not be after to")
+    if (date_to - date_from).days >= MAX_WINDOW_DAYS:
+        raise ValueError(f"windows are limited to {MAX_WINDOW_DAYS} days")
+    return date_from, date_to, granularity
+
+def parse_city_ids(data):
+    # {"city_ids": [uuid, ...]}; older clients send the list under another
+    # key (the frontend uses provinceIds), which is still read.
+    if not isinstance(data, dict) or not data:
+        raise ValueError("city_ids must be a list of city ids")
+    city_ids = data["city_ids"] if "city_ids" in data else next(iter(data.values()))
+    if not isinstance(city_ids, list) or not city_ids:
+        raise ValueError("city_ids must be a list of city ids")
+    try:
+        city_ids = list(dict.fromkeys(uuid.UUID(str(city_id)) for city_id in city_ids))
+    except ValueError:
+        raise ValueError("city_ids must be a list of city ids")
+    if len(city_ids) > MAX_COMPARE_CITIES:
+        raise ValueError(f"at most {MAX_COMPARE_CITIES} cities can be compared at once")
+    return city_ids
+
+def window_buckets(date_from, date_to, granularity):
+    buckets = []
+    start = date_from
+    while start <= date_to:
+        if granularity == "day":
+            end = start
+        elif granularity == "week":
+            end = start + timedelta(days=6 - start.weekday())
+        else:
+            next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+            end = next_month - timedelta(days=1)
+        end = min(end, date_to)
+        buckets.append((start, end))
+        start = end + timedelta(days=1)
+    return buckets
+
+def cumulative_sums(scope, days, keys=None):
+    return scope_cumulative_sums({scope: days}, keys).get(scope, {})
+
+def scope_cumulative_sums(scope_days, keys=None):
+    # Prefix sums of every series in each scope at that scope's days, read
+    # in one indexed equality lookup. Days after the last ingested date use
+    # that date; a series has no row before its first day, which reads as zero.
+    last_dates = dict(DailyRollup.objects
+                      .filter(scope__in=list(scope_days))
+                      .values('scope')
+                      .annotate(last=Max('date'))
+                      .order_by()
+                      .values_list('scope', 'last'))
+    lookups = {}
+    query = Q()
+    for scope, days in scope_days.items():
+        if scope in last_dates:
+            lookups[scope] = {day: min(day, last_dates[scope]) for day in days}
+            query |= Q(scope=scope, date__in=set(lookups[scope].values()))
+    if not lookups:
+        return {}
+    rows = DailyRollup.objects.filter(query)
+    if keys is not None:
+        rows = rows.filter(key__in=keys)
+    found = {}
+    for scope, key, day, *values in rows.values_list('scope', 'key', 'date', 'cum_posts', 'cum_positive', 'cum_neutral', 'cum_negative'):
+        found[(scope, key, day)] = tuple(values)
+    sums = {}
+    for scope, key in {(scope, key) for scope, key, _ in found}:
+        lookup = lookups[scope]
+        sums.setdefault(scope, {})[key] = {day: found.get((scope, key, lookup[day]), (0, 0, 0, 0)) for day in scope_days[scope]}
+    return sums
+
+def window_totals(scope, date_from, date_to, keys=None, sums=None):
+    # `sums` may be prefix sums already read for a superset of the days.
+    before = date_from - timedelta(days=1)
+    if sums is None:
+        sums = cumulative_sums(scope, [before, date_to], keys)
+    totals = {}
+    for key, at in sums.items():
+        totals[key] = tuple(end - start for end, start in zip(at[date_to], at[before]))
+    return totals
+
+def window_days(window):
+    # The buckets of a window and the days whose prefix sums they need.
+    date_from, date_to, granularity = window
+    buckets = window_buckets(date_from, date_to, granularity)
+    return buckets, [date_from - timedelta(days=1)] + [end for _, end in buckets]
+
+def window_series(scope, window, keys=None, sums=None):
+    buckets, days = window_days(window)
+    if sums is None:
+        sums = cumulative_sums(scope, days, keys)
+    series = {}
+    for key, at in sums.items():
+        points = []
+        for (start, end), previous in zip(buckets, days):
+            points.append(tuple(after - before for after, before in zip(at[end], at[previous])))
+        series[key] = points
+    return buckets, series
+
+def window_label(start, granularity):
+    if granularity == "day":
+        return DAY_NAMES[int(start.strftime('%w'))]
+    return start.isoformat()
+
+def generate_window_trends(scope, key, window, sums=None):
+    buckets, series = window_series(scope, window, [key], sums)
+    points = series.get(key, [(0, 0, 0, 0)] * len(buckets))
     trend = []
-    today = timezone.localdate()
-    today = today - timedelta(days=15)
-    for i in range(0,6):
-        day = today - timedelta(days=i)
-        day_num = day.strftime('%w')
-        day_name = ""
-        match int(day_num):
-            case 0:
-                day_name = "Paz"
-            case 1:
-                day_name = "Pzt"
-            case 2:
-                day_name = "Sal"
-            case 3:
-                day_name = "Çar"
-            case 4:
-                day_name = "Per"
-            case 5:
-                day_name = "Cum"
-            case 6:
-                day_name = "Cmt"
-        try:
-            data = NationalDataLog.objects.get(date = day)
-            data.set_posts()
-            posts = data.posts
-        except NationalDataLog.DoesNotExist:
-            posts=0
-        trend.insert(0,{"day":day_name, "sayı":posts})
+    for (start, _), values in zip(buckets, points):
+        trend.append({"day":window_label(start, window[2]), "date":start.isoformat(), "sayı":values[0]})
     return trend
 
-def generate_regional_performance():
-    REGIONS = [
-        "İç Anadolu Bölgesi",
-        "Doğu Anadolu Bölgesi",
-        "Güneydoğu Anadolu Bölgesi",
-        "Ege Bölgesi",
-        "Marmara Bölgesi",
-        "Akdeniz Bölgesi",
-        "Karadeniz Bölgesi"
-    ]
-    performance = []
+def regional_window_days(window):
+    date_from, date_to, _ = window
+    length = date_to - date_from + timedelta(days=1)
+    return [date_from - length - timedelta(days=1), date_from - timedelta(days=1), date_to]
+
+def generate_window_regional_performance(window, sums=None):
+    date_from, date_to, _ = window
+    length = date_to - date_from + timedelta(days=1)
+    posts = {key: values[0] for key, values in window_totals('region', date_from, date_to, sums=sums).items()}
+    old_posts = {key: values[0] for key, values in window_totals('region', date_from - length, date_from - timedelta(days=1), sums=sums).items()}
+    return regional_performance(posts, old_posts)
+
+def window_top_regions(date_from, date_to, sums=None):
+    # The city with the most posts of each platform in the window, from the
+    # prefix sums of every (platform, city) series at the window's two ends.
+    totals = window_totals('platform_city', date_from, date_to, sums=sums)
+    names = {str(city_id): name for city_id, name in City.objects.values_list('id', 'name')}
+    top = {}
+    for key, values in totals.items():
+        platform, city_id = key.split('|', 1)
+        name = names.get(city_id)
+        if name is None or values[0] <= 0:
+            continue
+        best = top.get(platform)
+        if best is None or values[0] > best[0] or (values[0] == best[0] and name < best[1]):
+            top[platform] = (values[0], name)
+    return {platform: name for platform, (_, name) in top.items()}
+
+def generate_window_national_social(window, sums=None, city_sums=None):
+    # `sums` and `city_sums` are prefix sums of the platform and
+    # platform_city scopes, when already read. The main hashtag is summed
+    # over the window's PlatformHashtag rows, a range scan that grows with
+    # the window: per-hashtag daily rollups would multiply the rollup table
+    # by the hashtag vocabulary.
+    date_from, date_to, _ = window
+    totals = window_totals('platform', date_from, date_to, sums=sums)
+    top_regions = window_top_regions(date_from, date_to, city_sums)
+    main_hashtags = top_tags_by_platform('hashtag', platform__date__range=(date_from, date_to))
+    social = []
+    for platform in PLATFORMS.keys():
+        posts, positive, neutral, negative = totals.get(platform, (0, 0, 0, 0))
+        sentiment = {"Pozitif":positive, "Nötr":neutral, "Negatif":negative}
+        social.append(platform_social(platform, posts, sentiment, top_regions.get(platform), main_hashtags.get(platform)))
+    return social
+
+def generate_window_weekly_social(window, sums=None):
+    buckets, series = window_series('platform', window, sums=sums)
+    social = []
+    for index, (start, _) in enumerate(buckets):
+        day_social = {"day":window_label(start, window[2]), "date":start.isoformat()}
+        for platform in PLATFORMS.keys():
+            values = series.get(platform)
+            day_social.update({PLATFORMS[platform]:values[index][0] if values else 0})
+        social.append(day_social)
+    return social
+
+def generate_national_weekly_trends(posts=None):
+    if posts is None:
+        posts = rollup_posts('national', trend_window())
+    return generate_trend_from_posts(posts.get('', {}))
+
+def generate_regional_performance(region_posts=None):
     today = timezone.localdate()
     today = today - timedelta(days=15)
     yesterday = today - timedelta(days=1)
-    cities = City.objects.all()
-    for region in REGIONS:
-        post = 0
-        old_post = 0
-        for city in cities:
-            if city.region == region:
-                platforms = DataofPlatforms.objects.filter(city=city, date=today)
-                for platform in platforms:
-                    post += platform.posts
-        for city in cities:
-            if city.region == region:
-                platforms = DataofPlatforms.objects.filter(city=city, date=yesterday)
-                for platform in platforms:
-                    old_post += platform.posts
+    if region_posts is None:
+        region_posts = rollup_posts('region', [today, yesterday])
+    posts = {}
+    old_posts = {}
+    for region, daily_posts in region_posts.items():
+        posts[region] = daily_posts.get(today.isoformat(), 0)
+        old_posts[region] = daily_posts.get(yesterday.isoformat(), 0)
+    return regional_performance(posts, old_posts)
+
+def regional_performance(posts, old_posts):
+    performance = []
+    for region, _ in City.REGIONS:
+        post = posts.get(region, 0)
+        old_post = old_posts.get(region, 0)
         if old_post != 0:
             margin = (((post/old_post)*100)-100)
         else: margin = 0
@@ -172,103 +381,111 @@ def generate_regional_performance():
     return performance
                         
 def generate_national_social():
+    summaries = {summary.name: summary for summary in PlatformSummary.objects.all()}
     social = []
-    PLATFORMS = {"X (Twitter)":"twitter", "Instagram":"instagram", "NSosyal":"next"}
     for platform in PLATFORMS.keys():
-        detail = {"platform":platform, "icon":PLATFORMS[platform]}
-        total_post = 0
-        total_positive = 0
-        total_total = 0
-        platforms = DataofPlatforms.objects.filter(name = platform)
-        for pltfrm in platforms:
-            total_post += pltfrm.posts
-            total_positive += pltfrm.sentiment["Pozitif"]
-            total_total += pltfrm.sentiment["Pozitif"] + pltfrm.sentiment["Nötr"] + pltfrm.sentiment["Negatif"]
-        avg_positive = 0
-        if total_total != 0:
-            avg_positive = (float(int((total_positive/total_total)*10000)))/100
-        else: avg_positive = 0
-        detail.update({"avgSentiment":avg_positive})
-        detail.update({"totalPosts":total_post})
-        cities = City.objects.all()
-        max_city = {"": 0}
-        for city in cities:
-            post_city = 0
-            pltfrms = city.platforms.filter(name = platform)
-            for pltfrm in pltfrms:
-                post_city += pltfrm.posts
-            for key, val in max_city.items():
-                if key == "" or post_city >= val:
-                    max_city = {city.name : post_city}
-        for key in max_city.keys():
-            detail.update({"topRegion":key})
-        hashtags_list = {}
-        for pltfrm in platforms:
-            for key, val in pltfrm.hashtags_list.items():
-                if key in hashtags_list.keys():
-                    itemval = hashtags_list[key]
-                    hashtags_list.update({key:itemval + val})
-            else: 
-                hashtags_list.update({key:val})
-        hashtags_list = {k: v for k, v in sorted(hashtags_list.items(), key=lambda item: item[1], reverse=True)}
-        mainHashtag = ""
-        for key in hashtags_list.keys():
-            mainHashtag = key
-            break
-        detail.update({"mainHashtag":mainHashtag})
-        social.append(detail)
+        summary = summaries.get(platform, PlatformSummary(name=platform))
+        social.append(platform_social(platform, summary.posts, summary.sentiment or {}, summary.topRegion, summary.mainHashtag))
     return social
 
-def generate_weekly_social():
-    PLATFORMS = {"X (Twitter)":"twitter", "Instagram":"instagram", "NSosyal":"next"}
+def platform_social(platform, posts, sentiment, topRegion, mainHashtag):
+    detail = {"platform":platform, "icon":PLATFORMS[platform]}
+    total_positive = sentiment.get("Pozitif", 0)
+    total_total = total_positive + sentiment.get("Nötr", 0) + sentiment.get("Negatif", 0)
+    if total_total != 0:
+        avg_positive = (float(int((total_positive/total_total)*10000)))/100
+    else: avg_positive = 0
+    detail.update({"avgSentiment":avg_positive})
+    detail.update({"totalPosts":posts})
+    detail.update({"topRegion":topRegion or ""})
+    detail.update({"mainHashtag":mainHashtag or ""})
+    return detail
+
+def generate_weekly_social(posts=None):
     social = []
-    today = timezone.localdate()
-    today = today - timedelta(days=15)
-    for i in range(0,6):
-        day = today - timedelta(days=i)
-        day_num = day.strftime('%w')
-        day_name = ""
-        match int(day_num):
-            case 0:
-                day_name = "Paz"
-            case 1:
-                day_name = "Pzt"
-            case 2:
-                day_name = "Sal"
-            case 3:
-                day_name = "Çar"
-            case 4:
-                day_name = "Per"
-            case 5:
-                day_name = "Cum"
-            case 6:
-                day_name = "Cmt"
+    if posts is None:
+        posts = rollup_posts('platform', trend_window())
+    for day in trend_window():
+        day_name = DAY_NAMES[int(day.strftime('%w'))]
         day_social = {"day":day_name}
         for platform in PLATFORMS.keys():
-            total_platform = 0
-            platforms = DataofPlatforms.objects.filter(name = platform, date = day)
-            for pltfrm in platforms:
-                total_platform += pltfrm.posts
+            total_platform = posts.get(platform, {}).get(day.isoformat(), 0)
             day_social.update({PLATFORMS[platform]:total_platform})
-        social.insert(0, day_social)
+        social.append(day_social)
     return social
 
+# bundle parts and the rollup scope each of them reads
+BUNDLE_PARTS = {
+    "national": None,
+    "weekly-trends": "national",
+    "regional-performance": "region",
+    "platform-comparison": "platform",
+}
+
+def parse_bundle_parts(params):
+    # `parts` is a comma separated subset of BUNDLE_PARTS, all by default;
+    # the bundle's keys come back in the order asked for.
+    if not params.get("parts"):
+        return list(BUNDLE_PARTS)
+    parts = [part.strip() for part in params["parts"].split(",") if part.strip()]
+    unknown = [part for part in parts if part not in BUNDLE_PARTS]
+    if unknown or not parts:
+        raise ValueError("parts must be a comma separated list of: " + ", ".join(BUNDLE_PARTS))
+    if len(set(parts)) < len(parts):
+        raise ValueError("parts must not be repeated")
+    return parts
+
+def generate_rollup_panels(parts, window=None):
+    # The rollup-backed panels of a bundle share one read of the rollups:
+    # the fixed 6-day window reads every scope's daily posts at once, a
+    # date window reads every scope's prefix sums at once.
+    scopes = [BUNDLE_PARTS[part] for part in parts if BUNDLE_PARTS[part]]
+    panels = {}
+    if not scopes:
+        return panels
+    if window is None:
+        posts = rollup_posts_by_scope(scopes, trend_window())
+        if "weekly-trends" in parts:
+            panels["weekly-trends"] = generate_national_weekly_trends(posts.get('national', {}))
+        if "regional-performance" in parts:
+            panels["regional-performance"] = generate_regional_performance(posts.get('region', {}))
+        if "platform-comparison" in parts:
+            panels["platform-comparison"] = {"nationalSocial":generate_national_social(),
+                                             "weeklyComparison":generate_weekly_social(posts.get('platform', {}))}
+        return panels
+    _, days = window_days(window)
+    scope_days = {scope: days for scope in scopes}
+    if 'region' in scope_days:
+        scope_days['region'] = regional_window_days(window)
+    if 'platform' in scope_days:
+        scope_days['platform_city'] = [window[0] - timedelta(days=1), window[1]]
+    sums = scope_cumulative_sums(scope_days)
+    if "weekly-trends" in parts:
+        panels["weekly-trends"] = generate_window_trends('national', '', window, sums.get('national', {}))
+    if "regional-performance" in parts:
+        panels["regional-performance"] = generate_window_regional_performance(window, sums.get('region', {}))
+    if "platform-comparison" in parts:
+        panels["platform-comparison"] = {"nationalSocial":generate_window_national_social(window, sums.get('platform', {}),
+                                                                                          sums.get('platform_city', {})),
+                                         "weeklyComparison":generate_window_weekly_social(window, sums.get('platform', {}))}
+    return panels
+
 def generate_city_social(city_id):
-    city = City.objects.get(id = city_id)
     social = []
-    PLATFORMS = {"X (Twitter)":"twitter", "Instagram":"instagram", "NSosyal":"next"}
+    totals = (DataofPlatforms.objects
+              .filter(city_id=city_id)
+              .values('name')
+              .annotate(total_posts=Sum('posts'), **sentiment_sums()))
+    totals = {row['name']: row for row in totals}
+    main_hashtags = top_tags_by_platform('hashtag', platform__city_id=city_id)
+    main_topics = top_tags_by_platform('topic', platform__city_id=city_id)
     for platform in PLATFORMS.keys():
         detail = {"platform":platform, "icon":PLATFORMS[platform]}
-        total_post = 0
-        total_positive = 0
-        total_neutral = 0
-        total_negative = 0
-        platforms = DataofPlatforms.objects.filter(name = platform, city = city)
-        for pltfrm in platforms:
-            total_post += pltfrm.posts
-            total_positive += pltfrm.sentiment["Pozitif"]
-            total_neutral += pltfrm.sentiment["Nötr"]
-            total_negative += pltfrm.sentiment["Negatif"]
+        row = totals.get(platform, {})
+        total_post = row.get('total_posts') or 0
+        total_positive = row.get('positive') or 0
+        total_neutral = row.get('neutral') or 0
+        total_negative = row.get('negative') or 0
         total_total = total_neutral + total_negative + total_positive
         avg_positive = 0
         avg_neutral = 0
@@ -277,42 +494,11 @@ def generate_city_social(city_id):
             avg_positive = (float(int((total_positive/total_total)*10000)))/100
             avg_neutral = (float(int((total_neutral/total_total)*10000)))/100
             avg_negative = (float(int((total_negative/total_total)*10000)))/100
-        else:
-            avg_negative = 0
-            avg_neutral = 0
-            avg_positive = 0
         sentiment = {"positive":avg_positive, "neutral":avg_neutral, "negative":avg_negative}
         detail.update({"sentiment":sentiment})
         detail.update({"posts":total_post})
-        hashtags_list = {}
-        for pltfrm in platforms:
-            for key, val in pltfrm.hashtags_list.items():
-                if key in hashtags_list.keys():
-                    itemval = hashtags_list[key]
-                    hashtags_list.update({key:itemval + val})
-            else: 
-                hashtags_list.update({key:val})
-        hashtags_list = {k: v for k, v in sorted(hashtags_list.items(), key=lambda item: item[1], reverse=True)}
-        mainHashtag = ""
-        for key in hashtags_list.keys():
-            mainHashtag = key
-            break
-        detail.update({"mainHashtag":mainHashtag})
-        topics_list = {}
-        for pltfrm in platforms:
-            if isinstance(pltfrm.topics_list, dict):
-                for key, val in pltfrm.topics_list.items():
-                    if key in topics_list.keys():
-                        itemval = topics_list[key]
-                        topics_list.update({key:itemval + val})
-                else: 
-                    topics_list.update({key:val})
-        topics_list = {k: v for k, v in sorted(topics_list.items(), key=lambda item: item[1], reverse=True)}
-        maintopic = ""
-        for key in topics_list.keys():
-            maintopic = key
-            break
-        detail.update({"topTopic":maintopic})
+        detail.update({"mainHashtag":main_hashtags.get(platform, "")})
+        detail.update({"topTopic":main_topics.get(platform, "")})
         social.append(detail)
     for i in social:
         total_posts = 0
@@ -326,60 +512,364 @@ def generate_city_social(city_id):
         i.update({"impact":impact})
     return social
             
+def hashtag_rank_points(rank):
+    if rank < 5:
+        return 0.5
+    if rank < 10:
+        return 0.4
+    if rank < 15:
+        return 0.3
+    if rank < 20:
+        return 0.2
+    return 0
+
 def genereate_city_points(hastag_list):
     city_points = []
-    cities = City.objects.all()
-    for city in cities:
-        city_point = 0
-        city = prepare_city(city.id)
-        for hashtag in hastag_list:
-            for key in city.hashtags_list.keys():
-                i=0
-                while i < 5:
-                    if key == hashtag:
-                        city_point += 0.5
-                        i=20
-                    i+=1
-                while i < 10:
-                    if key == hashtag:
-                        city_point += 0.4
-                        i=20
-                    i+=1
-                while i < 15:
-                    if key == hashtag:
-                        city_point += 0.3
-                        i=20
-                    i+=1
-                while i < 20:
-                    if key == hashtag:
-                        city_point += 0.2
-                        i=20
-                    i+=1
-        match len(hastag_list):
-            case 0:
-                city_point = 1.5
-            case 1: 
-                city_point *= 3
-            case 2:
-                city_point = (city_point*3)/2
-            case 3:
-                city_point = city_point
-        city_point = (city_point*2)/3
-        city_points.append({"provinceId":city.id, "score":city_point})
+    points = {}
+    ranks = HashtagRank.objects.filter(hashtag__in=hastag_list).values_list('hashtag', 'city_id', 'rank')
+    for hashtag, city_id, rank in ranks:
+        # a hashtag asked for twice counts twice, as it always has
+        points[city_id] = points.get(city_id, 0) + hashtag_rank_points(rank) * hastag_list.count(hashtag)
+    for city_id in City.objects.values_list('id', flat=True):
+        if hastag_list:
+            city_point = (points.get(city_id, 0)*2)/len(hastag_list)
+        else:
+            city_point = 1.0
+        city_points.append({"provinceId":city_id, "score":city_point})
     return city_points
-            
 
-        
-        
-        
+def city_sentiment_share(sentiment):
+    if sentiment and isinstance(sentiment, dict):
+        total = 0
+        for val in sentiment.values():
+            total += val
+        if total != 0:
+            pozitif = (float(int((sentiment["Pozitif"]/total)*10000)))/100
+            notr = (float(int((sentiment["Nötr"]/total)*10000)))/100
+            negatif = (float(int((sentiment["Negatif"]/total)*10000)))/100
+            return {"positive":pozitif,"neutral":notr,"negative":negatif}
+        return {"positive":0,"neutral":0,"negative":0}
+    return None
 
+def intern_tags(kind, names):
+    tag_model = TAG_TABLES[kind][0]
+    names = list(set(names))
+    tag_model.objects.bulk_create([tag_model(name=name) for name in names], ignore_conflicts=True, batch_size=500)
+    ids = {}
+    for i in range(0, len(names), 500):
+        ids.update(tag_model.objects.filter(name__in=names[i:i+500]).values_list('name', 'id'))
+    return ids
 
+def add_platform_tags(platforms, replaced_ids=()):
+    # count rows of `replaced_ids`, platform rows overwritten in place, are
+    # written anew
+    for kind, (tag_model, platform_model, city_model, field) in TAG_TABLES.items():
+        if replaced_ids:
+            platform_model.objects.filter(platform_id__in=replaced_ids).delete()
+        lists = []
+        for platform in platforms:
+            counts = getattr(platform, field)
+            if isinstance(counts, dict):
+                lists.append((platform.id, counts))
+        ids = intern_tags(kind, [key for _, counts in lists for key in counts])
+        platform_model.objects.bulk_create([
+            platform_model(platform_id=platform_id, count=val, **{f'{kind}_id': ids[key]})
+            for platform_id, counts in lists for key, val in counts.items()
+        ], batch_size=1000)
 
+def rebuild_city_tags(city_ids=None):
+    # every city's count rows, or only those of `city_ids`
+    cities = City.objects.all() if city_ids is None else City.objects.filter(id__in=city_ids)
+    for kind, (tag_model, platform_model, city_model, field) in TAG_TABLES.items():
+        lists = []
+        for city_id, counts in cities.values_list('id', field):
+            if isinstance(counts, dict):
+                lists.append((city_id, counts))
+        ids = intern_tags(kind, [key for _, counts in lists for key in counts])
+        with transaction.atomic():
+            city_model.objects.filter(city__in=cities).delete()
+            city_model.objects.bulk_create([
+                city_model(city_id=city_id, count=val, **{f'{kind}_id': ids[key]})
+                for city_id, counts in lists for key, val in counts.items()
+            ], batch_size=1000)
 
+def top_tags(kind, k=10, city_id=None, platform=None, date_from=None, date_to=None, region=None):
+    # Top-k (name, count) pairs, every pair when k is None. A whole city
+    # reads its own count table; anything narrower sums the per-row counts
+    # of the matching rows.
+    tag_model, platform_model, city_model, field = TAG_TABLES[kind]
+    name = f'{kind}__name'
+    if city_id is not None and platform is None and date_from is None and date_to is None and region is None:
+        rows = city_model.objects.filter(city_id=city_id).order_by('-count', name).values_list(name, 'count')
+        return list(rows[0:k])
+    filters = {}
+    if city_id is not None:
+        filters['platform__city_id'] = city_id
+    if platform is not None:
+        filters['platform__name'] = platform
+    if date_from is not None:
+        filters['platform__date__gte'] = date_from
+    if date_to is not None:
+        filters['platform__date__lte'] = date_to
+    if region is not None:
+        filters['platform__city__region'] = region
+    rows = (platform_model.objects
+            .filter(**filters)
+            .values(name)
+            .annotate(total=Sum('count'))
+            .order_by('-total', name)
+            .values_list(name, 'total'))
+    return list(rows[0:k])
 
-                
+def top_tags_by_platform(kind, **filters):
+    # The most counted tag of every platform in one grouped query; the
+    # ranking runs in the database so only one row per platform comes back.
+    platform_model = TAG_TABLES[kind][1]
+    name = f'{kind}__name'
+    rank = Window(RowNumber(), partition_by=F('platform__name'), order_by=[F('total').desc(), F(name).asc()])
+    rows = (platform_model.objects
+            .filter(**filters)
+            .values('platform__name', name)
+            .annotate(total=Sum('count'))
+            .annotate(rank=rank)
+            .filter(rank=1)
+            .values_list('platform__name', name))
+    return dict(rows)
 
-        
-        
+def sentiment_sums():
+    sums = {}
+    for field, key in SENTIMENT_KEYS.items():
+        sums[field] = Sum(Cast(KT(f'sentiment__{key}'), BigIntegerField()))
+    return sums
+
+def rebuild_platform_summaries():
+    totals = DataofPlatforms.objects.values('name').annotate(total_posts=Sum('posts'), **sentiment_sums())
+    top_regions = {}
+    city_posts = (DataofPlatforms.objects
+                  .values('name', 'city__name')
+                  .annotate(total_posts=Sum('posts'))
+                  .order_by('name', '-total_posts'))
+    for row in city_posts:
+        top_regions.setdefault(row['name'], row['city__name'])
+    main_hashtags = top_tags_by_platform('hashtag')
+    summaries = []
+    for row in totals:
+        summaries.append(PlatformSummary(
+            name=row['name'],
+            posts=row['total_posts'] or 0,
+            sentiment={key: row[field] or 0 for field, key in SENTIMENT_KEYS.items()},
+            topRegion=top_regions.get(row['name']),
+            mainHashtag=main_hashtags.get(row['name']),
+        ))
+    with transaction.atomic():
+        PlatformSummary.objects.all().delete()
+        PlatformSummary.objects.bulk_create(summaries)
+    return len(summaries)
+
+def add_daily_posts(daily_posts, platforms):
+    rows = platforms.values('city_id', 'date').annotate(total_posts=Sum('posts'))
+    for row in rows:
+        if row['date'] is None:
+            continue
+        city_posts = daily_posts.setdefault(row['city_id'], {})
+        city_posts[row['date'].isoformat()] = row['total_posts']
+    return daily_posts
+
+def city_snapshot(city, daily_posts):
+    # the top lists come from the city's count tables, so rebuild_city_tags
+    # runs first
+    hashtags = [name for name, _ in top_tags('hashtag', None, city_id=city.id)]
+    topics = []
+    for key, val in top_tags('topic', 10, city_id=city.id):
+        topics.append({"text":key, "value":val})
+    return CitySnapshot(
+        city=city,
+        name=city.name,
+        region=city.region,
+        mainHashtag=city.mainHashtag,
+        inclination=city.inclination,
+        sentiment=city.sentiment,
+        sentiment_share=city_sentiment_share(city.sentiment),
+        hashtags=hashtags,
+        topics=topics,
+        daily_posts=daily_posts,
+    )
+
+def rebuild_city_snapshots():
+    daily_posts = add_daily_posts({}, DataofPlatforms.objects.all())
+    snapshots = [city_snapshot(city, daily_posts.get(city.id, {})) for city in City.objects.all()]
+    with transaction.atomic():
+        CitySnapshot.objects.all().delete()
+        CitySnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+def update_city_snapshots(city_ids, since):
+    # The snapshots of `city_ids` only, with the days after `since` added to
+    # the daily posts they already hold.
+    daily_posts = dict(CitySnapshot.objects.filter(city_id__in=city_ids).values_list('city_id', 'daily_posts'))
+    add_daily_posts(daily_posts, DataofPlatforms.objects.filter(city_id__in=city_ids, date__gt=since))
+    snapshots = [city_snapshot(city, daily_posts.get(city.id, {})) for city in City.objects.filter(id__in=city_ids)]
+    with transaction.atomic():
+        CitySnapshot.objects.filter(city_id__in=city_ids).delete()
+        CitySnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+def daily_series(platforms):
+    # {(scope, key): {date: (posts, positive, neutral, negative)}} of the
+    # given platform rows, and the latest date among them
+    series = {}
+    last_date = None
+    for scope, group_by in ROLLUP_GROUPS.items():
+        rows = (platforms
+                .filter(date__isnull=False)
+                .values('date', *group_by)
+                .annotate(total_posts=Sum('posts'), **sentiment_sums()))
+        for row in rows:
+            key = '|'.join(str(row[field]) for field in group_by)
+            values = (row['total_posts'] or 0, row['positive'] or 0, row['neutral'] or 0, row['negative'] or 0)
+            series.setdefault((scope, key), {})[row['date']] = values
+            if last_date is None or row['date'] > last_date:
+                last_date = row['date']
+    return series, last_date
+
+def rollup_rows(scope, key, days, start, last_date, cum=(0, 0, 0, 0)):
+    # dense from `start`, so a prefix sum at any date up to last_date is a
+    # single row; `cum` holds the running totals of the day before `start`
+    rollups = []
+    day = start
+    while day <= last_date:
+        values = days.get(day, (0, 0, 0, 0))
+        cum = tuple(total + value for total, value in zip(cum, values))
+        rollups.append(DailyRollup(
+            date=day,
+            scope=scope,
+            key=key,
+            posts=values[0],
+            positive=values[1],
+            neutral=values[2],
+            negative=values[3],
+            cum_posts=cum[0],
+            cum_positive=cum[1],
+            cum_neutral=cum[2],
+            cum_negative=cum[3],
+        ))
+        day += timedelta(days=1)
+    return rollups
+
+def rebuild_daily_rollups():
+    series, last_date = daily_series(DataofPlatforms.objects.all())
+    rollups = []
+    for (scope, key), days in series.items():
+        rollups.extend(rollup_rows(scope, key, days, min(days), last_date))
+    with transaction.atomic():
+        DailyRollup.objects.all().delete()
+        DailyRollup.objects.bulk_create(rollups, batch_size=2000)
+    return len(rollups)
+
+def extend_daily_rollups(since):
+    # Appends the days after `since`, the latest rolled up date, to every
+    # series, carrying its running totals forward. Earlier rows are kept.
+    series, last_date = daily_series(DataofPlatforms.objects.filter(date__gt=since))
+    if last_date is None:
+        return 0
+    carried = {}
+    rows = DailyRollup.objects.filter(date=since).values_list(
+        'scope', 'key', 'cum_posts', 'cum_positive', 'cum_neutral', 'cum_negative')
+    for scope, key, *cum in rows:
+        carried[(scope, key)] = tuple(cum)
+    rollups = []
+    for scope, key in {**carried, **series}:
+        days = series.get((scope, key), {})
+        if (scope, key) in carried:
+            rollups.extend(rollup_rows(scope, key, days, since + timedelta(days=1), last_date, carried[(scope, key)]))
+        else:
+            rollups.extend(rollup_rows(scope, key, days, min(days), last_date))
+    with transaction.atomic():
+        DailyRollup.objects.bulk_create(rollups, batch_size=2000)
+    return len(rollups)
+
+def rebuild_hashtag_index(city_ids=None):
+    # every city's ranks, or only those of `city_ids`
+    cities = City.objects.all() if city_ids is None else City.objects.filter(id__in=city_ids)
+    ranks = []
+    for city_id, hashtags_list in cities.values_list('id', 'hashtags_list'):
+        hashtags = list(sort_by_count(hashtags_list).keys())
+        for rank, hashtag in enumerate(hashtags[0:HASHTAG_INDEX_DEPTH]):
+            ranks.append(HashtagRank(hashtag=hashtag, city_id=city_id, rank=rank))
+    with transaction.atomic():
+        HashtagRank.objects.filter(city__in=cities).delete()
+        HashtagRank.objects.bulk_create(ranks)
+    return len(ranks)
+
+def rebuild_national_logs(since=None):
+    # One log per day from a grouped sum of posts and of topic counts,
+    # written with one bulk upsert on the date. With `since`, only the days
+    # after it are written.
+    platforms = DataofPlatforms.objects.filter(date__isnull=False)
+    topic_counts = PlatformTopic.objects.filter(platform__date__isnull=False)
+    if since is not None:
+        platforms = platforms.filter(date__gt=since)
+        topic_counts = topic_counts.filter(platform__date__gt=since)
+    topics = {}
+    rows = (topic_counts
+            .values('platform__date', 'topic__name')
+            .annotate(total=Sum('count'))
+            .order_by('platform__date', '-total', 'topic__name')
+            .values_list('platform__date', 'topic__name', 'total'))
+    for day, name, total in rows:
+        topics.setdefault(day, {})[name] = total
+    logs = []
+    for day, total in platforms.values('date').annotate(total_posts=Sum('posts')).values_list('date', 'total_posts'):
+        topics_list = topics.get(day, {})
+        logs.append(NationalDataLog(
+            date=day,
+            posts=total or 0,
+            topics_list=topics_list,
+            mainTopic=next(iter(topics_list), None),
+        ))
+    NationalDataLog.objects.bulk_create(
+        logs,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=['posts', 'topics_list', 'mainTopic'],
+    )
+    return len(logs)
+
+def get_dataset_version():
+    dataset = DatasetVersion.objects.filter(pk=1).first()
+    if dataset is None:
+        return DatasetVersion(pk=1)
+    return dataset
+
+async def aget_dataset_version():
+    dataset = await DatasetVersion.objects.filter(pk=1).afirst()
+    if dataset is None:
+        return DatasetVersion(pk=1)
+    return dataset
+
+def bump_dataset_version(ingested_through=None):
+    with transaction.atomic():
+        dataset, created = DatasetVersion.objects.select_for_update().get_or_create(pk=1)
+        dataset.version += 1
+        dataset.updated_at = timezone.now()
+        if ingested_through is not None:
+            dataset.ingested_through = ingested_through
+        dataset.save()
+    return dataset
 
+def run_panel(builder, *args):
+    # Runs on a worker thread with its own database connection, which is
+    # released once the panel is built.
+    try:
+        return builder(*args)
+    finally:
+        close_old_connections()
 
+async def gather_panels(*panels):
+    # Builds independent (builder, *args) panels concurrently, so the
+    # slowest panel rather than their sum sets the latency.
+    return await asyncio.gather(*(
+        sync_to_async(run_panel, thread_sensitive=False)(builder, *args)
+        for builder, *args in panels
+    ))
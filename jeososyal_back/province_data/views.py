@@ -1,94 +1,175 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.permissions import IsAdminUser
 from .serializers import *
 from .models import *
 from .utils import *
+from .cache import async_cached_response, async_conditional_response, cached_response, conditional_response
+from .realtime import NATIONAL_CHANNEL, city_channel, event_stream
+from .middleware import endpoint_metrics
+from .renderers import FastJSONRenderer
 
 
+def json_response(data, status=status.HTTP_200_OK):
+    # Async views are plain Django views (APIView is sync only); they render
+    # with the API's JSON renderer so the payloads match the other endpoints.
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+
 
 class CityAllView(APIView):
+    @conditional_response
+    @cached_response
     def get(self,request):
-        cities = City.objects.all()
-        if not cities.exists():
+        cities = snapshot_pre_rows(CitySnapshot.objects.all())
+        if not cities:
             return Response({"detail":"Something went wrong there are no cities yet"}, status=status.HTTP_404_NOT_FOUND)
-        for city in cities:
-            city = prepare_city(city.id)
-        serializer = CityPreSerializer(cities, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(cities, status=status.HTTP_200_OK)
     
 
 class CityOnlyView(APIView):
+    @conditional_response
+    @cached_response
     def get(self, request, city_id):
         try:
-            city = City.objects.get(id = city_id)
-        except City.DoesNotExist():
+            window = parse_window(request.query_params)
+        except ValueError as e:
+            return Response({"detail":str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        cities = snapshot_rows(CitySnapshot.objects.filter(city_id = city_id), window)
+        if not cities:
             return Response({"detail":"Something went wrong, city not found"}, status=status.HTTP_404_NOT_FOUND)
-        city = prepare_city(city_id)
-        serializer = CitySerializer(city)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(cities[0], status=status.HTTP_200_OK)
     
 class CityCompareView(APIView):
+    # Body: {"city_ids": [uuid, ...]} with at most MAX_COMPARE_CITIES ids.
+    # Cities come back in the order asked for, from a single query.
     def post(self, request):
-        cities_list=[]
-        for val in list(request.data.values())[0]:
-            cities_list.append(val)
-        cities = City.objects.filter(id__in=cities_list)
-        if not cities.exists():
+        try:
+            city_ids = parse_city_ids(request.data)
+        except ValueError as e:
+            return Response({"detail":str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        cities = {city["id"]: city for city in snapshot_rows(CitySnapshot.objects.filter(city_id__in=city_ids))}
+        if not cities:
             return Response({"detail":"Something went wrong there are no cities yet"}, status=status.HTTP_404_NOT_FOUND)
-        for city in cities:
-            city = prepare_city(city.id)
-        for city in cities:
-            if city.hashtags_list and isinstance(city.hashtags_list, dict):
-                city.hashtags_list = {k: v for k, v in sorted(city.hashtags_list.items(), key=lambda item: item[1], reverse=True)}
-            if city.topics_list and isinstance(city.topics_list, dict):
-                city.topics_list = {k: v for k, v in sorted(city.topics_list.items(), key=lambda item: item[1], reverse=True)}
-        serializer = CitySerializer(cities, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        cities = [cities[city_id] for city_id in city_ids if city_id in cities]
+        return Response(cities, status=status.HTTP_200_OK)
 
 class FiltersView(APIView):
+    @conditional_response
+    @cached_response
     def get(self, request):
         cities = City.objects.all()
         if not cities.exists():
             return Response({"detail":"Something went wrong there are no cities yet"}, status=status.HTTP_404_NOT_FOUND)
-        hashtags_list = create_global_hashtags(cities)
+        hashtags_list = create_global_hashtags()
         return Response(hashtags_list, status=status.HTTP_200_OK)
     
-class NationalDataView(APIView):
-    def get(self, request):
-        cities = City.objects.all()
-        if not cities.exists():
-            return Response({"detail":"Something went wrong there are no cities yet"}, status=status.HTTP_404_NOT_FOUND)
-        nationalHashtags = create_global_hashtags(cities)
-        nationalHashtags = nationalHashtags[0:10]
-        sentiment = generate_global_sentiment(cities)
-        topTopics = create_global_topics(cities)
-        topTopics = topTopics[0:10]
+class NationalDataView(View):
+    @async_conditional_response
+    @async_cached_response
+    async def get(self, request):
+        if not await City.objects.aexists():
+            return json_response({"detail":"Something went wrong there are no cities yet"}, status=status.HTTP_404_NOT_FOUND)
+        nationalHashtags, sentiment, topTopics = await gather_panels(
+            (create_global_hashtags, 10),
+            (generate_global_sentiment, City.objects.all()),
+            (create_global_topics, 10),
+        )
         nationalData = {"sentiment":sentiment, "topTopics":topTopics, "nationalHashtags":nationalHashtags}
-        return Response(nationalData, status=status.HTTP_200_OK)
+        return json_response(nationalData)
     
 class NationalTrendsView(APIView):
+    @conditional_response
+    @cached_response
     def get(self, request):
-        nationalTrends = generate_national_weekly_trends()
+        try:
+            window = parse_window(request.query_params)
+        except ValueError as e:
+            return Response({"detail":str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if window:
+            nationalTrends = generate_window_trends('national', '', window)
+        else:
+            nationalTrends = generate_national_weekly_trends()
         return Response(nationalTrends, status=status.HTTP_200_OK)
     
 class RegionalPerformanceView(APIView):
+    @conditional_response
+    @cached_response
     def get(self, request):
-        regionalData = generate_regional_performance()
+        try:
+            window = parse_window(request.query_params)
+        except ValueError as e:
+            return Response({"detail":str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if window:
+            regionalData = generate_window_regional_performance(window)
+        else:
+            regionalData = generate_regional_performance()
         return Response(regionalData, status=status.HTTP_200_OK)
     
-class NationalSocialView(APIView):
-    def get(self, request):
-        nationalSocial = generate_national_social()
-        weeklyComparison = generate_weekly_social()
+class NationalSocialView(View):
+    @async_conditional_response
+    @async_cached_response
+    async def get(self, request):
+        try:
+            window = parse_window(request.GET)
+        except ValueError as e:
+            return json_response({"detail":str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if window:
+            # both panels share one read of the platform prefix sums
+            panels, = await gather_panels((generate_rollup_panels, ["platform-comparison"], window))
+            return json_response(panels["platform-comparison"])
+        nationalSocial, weeklyComparison = await gather_panels((generate_national_social,), (generate_weekly_social,))
         nationalComparison = {"nationalSocial":nationalSocial, "weeklyComparison":weeklyComparison}
-        return Response(nationalComparison, status=status.HTTP_200_OK)
+        return json_response(nationalComparison)
+    
+class NationalBundleView(View):
+    @async_conditional_response
+    @async_cached_response
+    async def get(self, request):
+        try:
+            parts = parse_bundle_parts(request.GET)
+            window = parse_window(request.GET)
+        except ValueError as e:
+            return json_response({"detail":str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not await City.objects.aexists():
+            return json_response({"detail":"Something went wrong there are no cities yet"}, status=status.HTTP_404_NOT_FOUND)
+        panels = [(generate_rollup_panels, parts, window)]
+        if "national" in parts:
+            panels += [(create_global_hashtags, 10), (generate_global_sentiment, City.objects.all()), (create_global_topics, 10)]
+        rollupPanels, *nationalPanels = await gather_panels(*panels)
+        bundle = {}
+        for part in parts:
+            if part == "national":
+                nationalHashtags, sentiment, topTopics = nationalPanels
+                bundle[part] = {"sentiment":sentiment, "topTopics":topTopics, "nationalHashtags":nationalHashtags}
+            else:
+                bundle[part] = rollupPanels[part]
+        return json_response(bundle)
+    
+class RealtimeStreamView(View):
+    # Server-Sent Events for a city, or for the national view without one.
+    async def get(self, request, city_id=None):
+        if city_id is None:
+            channel = NATIONAL_CHANNEL
+        elif await CitySnapshot.objects.filter(city_id = city_id).aexists():
+            channel = city_channel(city_id)
+        else:
+            return json_response({"detail":"Something went wrong, city not found"}, status=status.HTTP_404_NOT_FOUND)
+        response = StreamingHttpResponse(event_stream(channel), content_type='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
     
 class SocialComparisonView(APIView):
+    @conditional_response
+    @cached_response
     def get(self, request, city_id):
         try:
             city = City.objects.get(id = city_id)
-        except City.DoesNotExist():
+        except City.DoesNotExist:
             return Response({"detail":"Something went wrong, city not found"}, status=status.HTTP_404_NOT_FOUND)
         socialComparison = generate_city_social(city.id)
         return Response(socialComparison, status=status.HTTP_200_OK)
@@ -101,10 +182,11 @@ class FiltersResultsView(APIView):
         scores = genereate_city_points(data)
         return Response(scores, status=status.HTTP_200_OK)
 
-        
-    
-    
-
-
-
+class MetricsView(APIView):
+    # Staff only. The API itself authenticates no one, so this view reads
+    # the admin site's session, or basic auth for scripts.
+    authentication_classes = [SessionAuthentication, BasicAuthentication]
+    permission_classes = [IsAdminUser]
 
+    def get(self, request):
+        return Response(endpoint_metrics(), status=status.HTTP_200_OK)